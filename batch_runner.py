@@ -0,0 +1,275 @@
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from multiprocessing.connection import wait
+
+from diagnostics import log_stats
+from excel_processor import ExcelProcessor
+
+
+# 单个文件的默认超时时间（秒）
+DEFAULT_TIMEOUT = 300
+
+# 可以取消时，检查取消请求的间隔（秒）
+CANCEL_POLL_INTERVAL = 0.2
+
+
+def default_workers():
+    """默认工作进程数：CPU核数"""
+    return os.cpu_count() or 1
+
+
+def processor_options(streaming=True, fast=True, calamine=False, line_items=None):
+    """ExcelProcessor的参数"""
+    return {
+        "streaming": streaming,
+        "fast": fast,
+        "calamine": calamine,
+        "line_items": line_items,
+    }
+
+
+def _load(source):
+    """任务的文件内容可以是bytes或内存中的文件对象，也可以是文件路径（由处理进程自行读取）；
+    还可以是无参数的函数（例如读取压缩包中的一个文件），到开始处理该文件时才调用"""
+    if callable(source):
+        return source()
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            return f.read()
+    return source
+
+
+def _process_one(processor, file_name, source):
+    try:
+        file_bytes = _load(source)
+    except Exception as e:
+        return ("retry", f"读取文件时出错: {str(e)}")
+    try:
+        return ("ok", processor.process_excel(file_bytes, file_name))
+    except Exception as e:
+        return ("error", str(e))
+
+
+def _worker_main(conn, processor_options):
+    """工作进程：逐个接收文件并提取，结果通过管道返回"""
+    processor = ExcelProcessor(**processor_options)
+    # 先导入解析所需的模块，再通知主进程（附带导入耗时）；超时从实际开始处理时计算
+    conn.send(("ready", None, None, processor.warm_up()))
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+        index, file_name, source = job
+        outcome = _process_one(processor, file_name, source)
+        conn.send(("done", index, outcome, processor.stats))
+    conn.close()
+
+
+class _Worker:
+    def __init__(self, context, processor_options):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main, args=(child_conn, processor_options), daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+        self.job = None  # (index, file_name)
+        self.deadline = None
+
+    def submit(self, index, file_name, source, timeout):
+        self.conn.send((index, file_name, source))
+        self.job = (index, file_name)
+        self.deadline = time.monotonic() + timeout if timeout else None
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class WorkerPool:
+    """多进程处理账单文件。每个工作进程同时只处理一个文件，
+    超时或异常退出（例如内存不足被系统终止）的进程会被终止并替换
+
+    调用warm()后为常驻进程池：工作进程预先启动并导入解析模块，多次map_files之间保持运行；
+    多个线程共用时，由使用方持有lock
+    """
+
+    def __init__(self, max_workers=None, timeout=DEFAULT_TIMEOUT, streaming=True, fast=True, calamine=False,
+                 line_items=None):
+        self.max_workers = max(1, max_workers or default_workers())
+        self.timeout = timeout
+        # 传给每个工作进程中ExcelProcessor的参数
+        self.processor_options = processor_options(streaming, fast, calamine, line_items)
+        self._context = multiprocessing.get_context("spawn")
+        self._workers = []
+        self.keep_warm = False
+        self.lock = threading.Lock()
+        # 最近启动的工作进程导入解析模块的耗时（秒）
+        self.warm_up_seconds = deque(maxlen=100)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _new_worker(self):
+        return _Worker(self._context, self.processor_options)
+
+    def warm(self):
+        """预先启动全部工作进程，并在每次map_files之后补足（被终止的进程立即替换）"""
+        self.keep_warm = True
+        self._top_up()
+        return self
+
+    def _top_up(self):
+        while len(self._workers) < self.max_workers:
+            self._workers.append(self._new_worker())
+
+    def map_files(self, jobs, on_done=None, on_stats=None, cancel=None):
+        """并行处理 jobs = [(file_name, file_bytes、文件路径或读取文件的函数), ...]
+
+        返回与jobs顺序一致的结果列表，每项为 ("ok", result)、("error", 错误信息)，
+        或 ("retry", 错误信息)（读取文件失败、超时或工作进程异常退出，重新处理可能成功，参见result_cache）。
+        每个文件完成时调用 on_done(index, file_name, outcome)，调用顺序取决于完成先后；
+        各阶段耗时统计写入日志并传给 on_stats(index, file_name, stats)（超时或进程退出时没有统计）。
+        cancel为threading.Event时可以取消：正在处理的文件被终止，未完成的文件结果为None。
+        """
+        outcomes = [None] * len(jobs)
+        pending = list(range(len(jobs)))
+        pending.reverse()
+        # 常驻进程池中空闲时已退出的进程（例如被系统终止）不再使用
+        self._workers = [worker for worker in self._workers if worker.job is not None or worker.process.is_alive()]
+        while len(self._workers) < min(self.max_workers, len(jobs)):
+            self._workers.append(self._new_worker())
+
+        def finish(index, outcome):
+            outcomes[index] = outcome
+            if on_done:
+                on_done(index, jobs[index][0], outcome)
+
+        while True:
+            if cancel is not None and cancel.is_set():
+                for worker in self._workers:
+                    if worker.job is not None:
+                        worker.kill()
+                self._workers = [worker for worker in self._workers if worker.job is None]
+                break
+
+            for worker in self._workers:
+                while worker.ready and worker.job is None and pending:
+                    index = pending.pop()
+                    file_name, source = jobs[index]
+                    if callable(source):
+                        # 在主进程中读取（分派时才读取，只有正在处理的文件在内存中）
+                        try:
+                            source = source()
+                        except Exception as e:
+                            finish(index, ("retry", f"读取文件时出错: {str(e)}"))
+                            continue
+                    worker.submit(index, file_name, source, self.timeout)
+
+            busy = [worker for worker in self._workers if worker.job is not None]
+            starting = [worker for worker in self._workers if not worker.ready]
+            if not busy and not (pending and starting):
+                break
+
+            deadlines = [worker.deadline for worker in busy if worker.deadline is not None]
+            wait_timeout = max(0, min(deadlines) - time.monotonic()) if deadlines else None
+            if cancel is not None:
+                wait_timeout = CANCEL_POLL_INTERVAL if wait_timeout is None else min(wait_timeout, CANCEL_POLL_INTERVAL)
+            ready = wait([worker.conn for worker in busy + starting], timeout=wait_timeout)
+
+            for position, worker in enumerate(self._workers):
+                if worker.conn in ready:
+                    try:
+                        message, index, outcome, stats = worker.conn.recv()
+                    except (EOFError, OSError):
+                        # 工作进程异常退出（例如内存不足被系统终止）
+                        worker.kill()
+                        if not worker.ready:
+                            raise RuntimeError(f"工作进程启动失败 (exitcode={worker.process.exitcode})")
+                        self._workers[position] = self._new_worker()
+                        if worker.job is not None:
+                            exitcode = worker.process.exitcode
+                            finish(worker.job[0], ("retry", f"处理文件时出错: 工作进程异常退出 (exitcode={exitcode})"))
+                        continue
+                    if message == "ready":
+                        worker.ready = True
+                        self.warm_up_seconds.append(stats)
+                        continue
+                    worker.job = None
+                    _report_stats(index, jobs[index][0], stats, on_stats)
+                    finish(index, outcome)
+                elif worker.job is not None and worker.deadline is not None and time.monotonic() >= worker.deadline:
+                    index = worker.job[0]
+                    worker.kill()
+                    self._workers[position] = self._new_worker()
+                    finish(index, ("retry", f"处理文件时出错: 处理超时（超过{self.timeout}秒）"))
+
+        if self.keep_warm:
+            self._top_up()
+        return outcomes
+
+    def close(self):
+        for worker in self._workers:
+            worker.stop()
+        self._workers = []
+
+
+def _report_stats(index, file_name, stats, on_stats):
+    log_stats(stats)
+    if on_stats and stats:
+        on_stats(index, file_name, stats)
+
+
+def process_files(jobs, max_workers=None, timeout=DEFAULT_TIMEOUT, streaming=True, fast=True,
+                  calamine=False, line_items=None, on_done=None, on_stats=None, cancel=None,
+                  pool=None):
+    """处理一批文件，返回与jobs顺序一致的结果列表（参见WorkerPool.map_files）
+
+    pool为常驻进程池（WorkerPool.warm()）时，只要处理参数相同且进程池空闲，就交给它处理（进程数和超时以进程池为准）；
+    否则只有一个文件或只允许一个进程时，直接在当前进程中处理（不限制超时，取消时当前文件处理完才停止）。
+    """
+    options = processor_options(streaming, fast, calamine, line_items)
+    if pool is not None and pool.processor_options == options and pool.lock.acquire(blocking=False):
+        try:
+            return pool.map_files(jobs, on_done=on_done, on_stats=on_stats, cancel=cancel)
+        finally:
+            pool.lock.release()
+
+    max_workers = max_workers or default_workers()
+    if len(jobs) > 1 and max_workers > 1:
+        with WorkerPool(max_workers=max_workers, timeout=timeout, **options) as pool:
+            return pool.map_files(jobs, on_done=on_done, on_stats=on_stats, cancel=cancel)
+
+    processor = ExcelProcessor(**options)
+    outcomes = [None] * len(jobs)
+    for index, (file_name, source) in enumerate(jobs):
+        if cancel is not None and cancel.is_set():
+            break
+        outcome = _process_one(processor, file_name, source)
+        _report_stats(index, file_name, processor.stats, on_stats)
+        outcomes[index] = outcome
+        if on_done:
+            on_done(index, file_name, outcome)
+    return outcomes
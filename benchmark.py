@@ -0,0 +1,201 @@
+"""账单提取性能测试：计时、峰值内存以及与基准结果的对比
+
+示例：
+    python benchmark.py --rows 1000 10000 100000              # 运行并与基准对比
+    python benchmark.py --rows 1000 10000 --save-baseline     # 保存为新的基准
+    python benchmark.py --rows --modes --imports bill_cli     # 只测量导入耗时
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from bill_generator import generate_bill
+from detail_scanner import (
+    ClaimsExtractor,
+    DetailSheetScanner,
+    FreightCountExtractor,
+    SpecialDiscountExtractor,
+    SummaryRowExtractor,
+)
+from excel_processor import ExcelProcessor
+from fast_xlsx import FastXlsxWorkbook
+from reader_backends import CalamineWorkbook, calamine_available
+from workbook_readers import OpenpyxlWorkbook
+
+
+# 读取方式及对应的ExcelProcessor参数
+MODES = {
+    "full": {},
+    "streaming": {"streaming": True},
+    "fast": {"fast": True},
+    "calamine": {"calamine": True},
+}
+EXTRACTORS = {
+    "当月单量": FreightCountExtractor,
+    "汇总数据": SummaryRowExtractor,
+    "理赔费用": ClaimsExtractor,
+    "特殊单票折扣": SpecialDiscountExtractor,
+}
+DEFAULT_BASELINE = "benchmark_baseline.json"
+
+# 测量冷启动导入耗时的入口模块：解析所需的较重的模块应在首次处理文件时才导入
+IMPORT_MODULES = ["excel_processor", "bill_cli", "表格处理"]
+
+
+def bill_path(workdir, rows, extra_sheets):
+    """生成（或复用已生成的）测试账单"""
+    path = os.path.join(workdir, f"bill_{rows}_{extra_sheets}.xlsx")
+    if not os.path.exists(path):
+        generate_bill(path, rows, extra_sheets=extra_sheets)
+    return path
+
+
+def _open_workbook(mode, path):
+    if mode == "fast":
+        return FastXlsxWorkbook(path)
+    if mode == "calamine":
+        return CalamineWorkbook(path)
+    return OpenpyxlWorkbook(path, streaming=mode == "streaming")
+
+
+def _scan_seconds(mode, path, extractors):
+    """单独遍历一次账单明细所用的时间（包括读取）"""
+    wb = _open_workbook(mode, path)
+    try:
+        start = time.perf_counter()
+        DetailSheetScanner(extractors).scan(wb.sheet("账单明细").iter_rows())
+        return time.perf_counter() - start
+    finally:
+        wb.close()
+
+
+def time_extractors(mode, path):
+    """各字段提取器的耗时：单独运行该提取器的遍历时间减去只读取不提取的时间"""
+    read_seconds = _scan_seconds(mode, path, [])
+    timings = {"读取": read_seconds}
+    for name, extractor in EXTRACTORS.items():
+        timings[name] = max(0.0, _scan_seconds(mode, path, [extractor()]) - read_seconds)
+    return timings
+
+
+def import_seconds(module, repeat):
+    """在新的Python进程中导入模块的耗时（取最快的一次，不包括解释器本身的启动时间）"""
+    code = f"import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+    seconds = None
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        elapsed = float(output.strip().splitlines()[-1])
+        seconds = elapsed if seconds is None else min(seconds, elapsed)
+    return seconds
+
+
+def run_case(mode, path, repeat):
+    """返回 (最快耗时, 峰值内存MB, 提取结果)"""
+    with open(path, "rb") as f:
+        file_bytes = f.read()
+    processor = ExcelProcessor(**MODES[mode])
+    file_name = os.path.basename(path)
+
+    seconds = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = processor.process_excel(file_bytes, file_name)
+        elapsed = time.perf_counter() - start
+        seconds = elapsed if seconds is None else min(seconds, elapsed)
+
+    # 峰值内存单独测量，tracemalloc会拖慢处理速度
+    tracemalloc.start()
+    try:
+        processor.process_excel(file_bytes, file_name)
+        peak_mb = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    finally:
+        tracemalloc.stop()
+
+    result = {key: value for key, value in result.items() if key != "文件名"}
+    return seconds, peak_mb, json.loads(json.dumps(result, ensure_ascii=False, default=str))
+
+
+def compare(case, current, baseline, tolerance):
+    """与基准对比，返回问题列表（结果不一致或耗时超过基准的(1+tolerance)倍）"""
+    problems = []
+    if current["result"] != baseline["result"]:
+        problems.append(f"{case}: 提取结果与基准不一致\n  基准: {baseline['result']}\n  当前: {current['result']}")
+    if current["seconds"] > baseline["seconds"] * (1 + tolerance):
+        problems.append(f"{case}: 耗时 {current['seconds']:.3f}s，基准 {baseline['seconds']:.3f}s")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="账单提取性能测试")
+    parser.add_argument("--rows", type=int, nargs="*", default=[1000, 10000, 100000], help="账单明细的行数")
+    # 未安装python-calamine时默认不测calamine
+    default_modes = [mode for mode in MODES if mode != "calamine" or calamine_available()]
+    parser.add_argument("--modes", nargs="*", choices=list(MODES), default=default_modes, help="读取方式")
+    parser.add_argument("--imports", nargs="*", default=IMPORT_MODULES,
+                        help="测量冷启动导入耗时的模块（不指定模块时不测量）")
+    parser.add_argument("--extra-sheets", type=int, default=2, help="测试账单中额外工作表的数量")
+    parser.add_argument("--repeat", type=int, default=3, help="每项重复次数（取最快的一次）")
+    parser.add_argument("--extractors", action="store_true", help="同时测量各字段提取器的耗时")
+    parser.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "shunfeng_bill_benchmark"),
+                        help="测试账单的存放目录（已生成的文件会复用）")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="基准结果文件")
+    parser.add_argument("--save-baseline", action="store_true", help="将本次结果保存为基准")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="允许的耗时增长比例")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.workdir, exist_ok=True)
+    cases = {}
+    for module in args.imports:
+        case = f"import/{module}"
+        seconds = import_seconds(module, args.repeat)
+        cases[case] = {"seconds": seconds, "peak_mb": None, "result": None}
+        print(f"{case:>16}  {seconds:8.3f}s  导入耗时")
+    for rows in args.rows:
+        path = bill_path(args.workdir, rows, args.extra_sheets)
+        for mode in args.modes:
+            case = f"{rows}/{mode}"
+            seconds, peak_mb, result = run_case(mode, path, args.repeat)
+            cases[case] = {"seconds": seconds, "peak_mb": peak_mb, "result": result}
+            print(f"{case:>16}  {seconds:8.3f}s  峰值内存 {peak_mb:8.1f}MB  {rows / seconds:10.0f} 行/秒")
+            if args.extractors:
+                for name, extractor_seconds in time_extractors(mode, path).items():
+                    print(f"{'':>16}  {extractor_seconds:8.3f}s  {name}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"cases": cases}, f, ensure_ascii=False, indent=2)
+        print(f"基准结果已保存到 {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"没有基准结果文件 {args.baseline}，可使用 --save-baseline 生成")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline_cases = json.load(f)["cases"]
+    problems = []
+    for case, current in cases.items():
+        if case in baseline_cases:
+            problems.extend(compare(case, current, baseline_cases[case], args.tolerance))
+    if problems:
+        print("与基准对比发现问题:", file=sys.stderr)
+        for problem in problems:
+            print(f"  {problem}", file=sys.stderr)
+        return 1
+    print("与基准对比：结果一致，耗时未超出允许范围")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
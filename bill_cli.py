@@ -0,0 +1,160 @@
+"""命令行批量提取账单数据（不依赖Streamlit）
+
+示例：
+    python bill_cli.py 账单/2024-05 "归档/**/*.xlsx" -o 结果.parquet -j 16
+    python bill_cli.py 月结账单.zip -o 结果.xlsx
+"""
+import argparse
+import glob
+import os
+import sys
+import zipfile
+
+from batch_runner import DEFAULT_TIMEOUT, default_workers, process_files
+from diagnostics import enable_stats_log
+from result_export import EXPORT_FORMATS, results_frame, write_results
+from zip_bundle import BILL_EXTENSIONS, bill_members, is_zip_name, member_reader
+
+
+# 目录中查找的文件扩展名：账单文件，以及账单压缩包
+INPUT_EXTENSIONS = BILL_EXTENSIONS + (".zip",)
+
+
+def collect_files(inputs):
+    """展开目录（递归）和通配符，返回去重后按路径排序的账单文件（及压缩包）列表"""
+    files = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, names in os.walk(item):
+                for name in names:
+                    if name.lower().endswith(INPUT_EXTENSIONS) and not name.startswith("~$"):
+                        files.add(os.path.join(root, name))
+        elif os.path.isfile(item):
+            files.add(item)
+        else:
+            for path in glob.glob(item, recursive=True):
+                if os.path.isfile(path):
+                    files.add(path)
+    return sorted(files)
+
+
+def output_format(path, fmt=None):
+    """根据--format或输出文件扩展名确定导出格式"""
+    if fmt:
+        return fmt
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in EXPORT_FORMATS:
+        raise ValueError(f"无法根据扩展名确定输出格式: {path}（支持 {', '.join(EXPORT_FORMATS)}）")
+    return EXPORT_FORMATS[ext]
+
+
+def write_failure_report(failed_files, path):
+    """失败文件报告（CSV：文件、错误）"""
+    import pandas as pd
+
+    report = pd.DataFrame(
+        [(file_path, error.split("Traceback")[0].strip()) for file_path, error in failed_files],
+        columns=["文件", "错误"],
+    )
+    report.to_csv(path, index=False, encoding="utf-8-sig")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="批量提取供销云仓账单数据")
+    parser.add_argument("inputs", nargs="+", help="账单文件、ZIP压缩包、目录或通配符（如 \"账单/**/*.xlsx\"）")
+    parser.add_argument("-o", "--output", required=True, help="输出文件（.csv / .xlsx / .parquet）")
+    parser.add_argument("--format", choices=sorted(set(EXPORT_FORMATS.values())), help="输出格式，默认按扩展名判断")
+    parser.add_argument("-j", "--workers", type=int, default=default_workers(), help="并行进程数，默认为CPU核数")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="单个文件超时（秒）")
+    parser.add_argument("--failure-report", help="失败文件报告的输出路径（CSV）")
+    parser.add_argument("--stats-log", help="将每个文件各处理阶段的耗时以JSON行写入该文件")
+    parser.add_argument("--full-mode", action="store_true", help="使用openpyxl完整模式读取（默认流式读取）")
+    parser.add_argument("--no-fast", action="store_true", help="不使用轻量级XLSX解析器")
+    parser.add_argument("--calamine", action="store_true", help="xlsx优先使用calamine读取（需要安装python-calamine）")
+    parser.add_argument("--line-items", metavar="DIR",
+                        help="同时将账单明细逐行导出到该目录（按月结账号、账单周期分区的Parquet数据集，可多次追加）")
+    parser.add_argument("-q", "--quiet", action="store_true", help="不输出处理进度")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    try:
+        fmt = output_format(args.output, args.format)
+    except ValueError as e:
+        parser.error(str(e))
+
+    files = collect_files(args.inputs)
+    if not files:
+        print("没有找到账单文件", file=sys.stderr)
+        return 2
+
+    if args.stats_log:
+        enable_stats_log(args.stats_log)
+
+    # 压缩包中的账单逐个交给处理进程，开始处理时才解压，不解压到磁盘
+    jobs = []
+    labels = []  # 与jobs对应的路径，用于输出进度和失败文件
+    failed_files = []
+    for path in files:
+        if not is_zip_name(path):
+            jobs.append((os.path.basename(path), path))
+            labels.append(path)
+            continue
+        try:
+            archive = zipfile.ZipFile(path)
+        except (OSError, zipfile.BadZipFile) as e:
+            failed_files.append((path, f"无法打开压缩包: {str(e)}"))
+            continue
+        for name, info in bill_members(archive):
+            jobs.append((f"{os.path.basename(path)}/{name}", member_reader(archive, info)))
+            labels.append(f"{path}/{name}")
+
+    total_files = len(jobs)
+    finished = 0
+
+    def on_done(index, file_name, outcome):
+        nonlocal finished
+        finished += 1
+        if not args.quiet:
+            status = "完成" if outcome[0] == "ok" else "失败"
+            print(f"[{finished}/{total_files}] {status}: {labels[index]}", file=sys.stderr)
+
+    outcomes = process_files(
+        jobs,
+        max_workers=args.workers,
+        timeout=args.timeout,
+        streaming=not args.full_mode,
+        fast=not args.no_fast,
+        calamine=args.calamine,
+        line_items=args.line_items,
+        on_done=on_done,
+    )
+
+    results = []
+    for path, (status, payload) in zip(labels, outcomes):
+        if status == "ok":
+            results.append(payload)
+        else:
+            failed_files.append((path, payload))
+
+    write_results(results_frame(results), args.output, fmt)
+    print(f"已完成处理 {len(results)} 个文件，结果已写入 {args.output}", file=sys.stderr)
+    if args.line_items:
+        print(f"账单明细已导出到 {args.line_items}", file=sys.stderr)
+
+    if failed_files:
+        print(f"{len(failed_files)} 个文件处理失败:", file=sys.stderr)
+        for path, error in failed_files:
+            print(f"  {path}: {error.split('Traceback')[0].strip()}", file=sys.stderr)
+        if args.failure_report:
+            write_failure_report(failed_files, args.failure_report)
+            print(f"失败文件报告已写入 {args.failure_report}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""生成模拟的供销云仓账单文件，用于性能测试
+
+示例：
+    python bill_generator.py 100000 -o 账单_10万行.xlsx --extra-sheets 2
+"""
+import argparse
+import random
+
+import openpyxl
+
+
+# 账单明细的列（N列为服务项目）
+DETAIL_HEADERS = [
+    "序号", "运单号", "寄件时间", "计费重量(kg)", "始发地", "目的地", "费用(元)",
+    "折扣/促销", "应付金额", "产品类型", "付款方式", "寄件人", "收件人", "服务项目",
+]
+SERVICES = ["运费", "运费", "运费", "运费", "运费", "保价", "包装服务", "签回单"]
+CITIES = ["北京", "上海", "广州", "深圳", "杭州", "成都", "武汉", "西安"]
+
+
+def _overview_rows(account, period, amount):
+    """账单总览的前17行；D6:G6、D7:G7、J17:L17为合并单元格"""
+    rows = [[None] * 12 for _ in range(17)]
+    rows[0][0] = "供销云仓账单"
+    rows[5][2] = "月结账号"
+    rows[5][3] = account
+    rows[6][2] = "账单周期"
+    rows[6][3] = period
+    rows[15][9] = "账单总览金额"
+    rows[16][8] = "合计"
+    rows[16][9] = amount
+    return rows
+
+
+def _detail_rows(rng, rows, claims_every, special_every):
+    """账单明细：标题行、明细行和末尾的合计行"""
+    yield ["账单明细"]
+    yield DETAIL_HEADERS
+
+    total_fee = 0.0
+    total_discount = 0.0
+    total_payable = 0.0
+    for index in range(1, rows + 1):
+        service = rng.choice(SERVICES)
+        weight = round(rng.uniform(0.5, 30), 1)
+        fee = round(8 + weight * rng.uniform(1, 3), 2)
+        discount = -round(fee * rng.choice([0, 0, 0.05, 0.1]), 2)
+        if claims_every and index % claims_every == 0:
+            service = "理赔"
+            discount = -round(rng.uniform(20, 500), 2)
+        elif special_every and index % special_every == 0:
+            service = "特殊单票折扣"
+            weight = round(rng.uniform(0.5, 0.95), 2)
+        payable = round(fee + discount, 2)
+        total_fee += fee
+        total_discount += discount
+        total_payable += payable
+        yield [
+            index,
+            f"SF{1300000000000 + index}",
+            f"2024-05-{index % 28 + 1:02d} {index % 24:02d}:{index % 60:02d}",
+            weight,
+            rng.choice(CITIES),
+            rng.choice(CITIES),
+            fee,
+            discount,
+            payable,
+            "顺丰标快",
+            "月结",
+            f"寄件人{index % 97}",
+            f"收件人{index % 89}",
+            service,
+        ]
+
+    yield []
+    yield ["合计", None, None, None, None, None,
+           round(total_fee, 2), round(total_discount, 2), round(total_payable, 2)]
+
+
+def generate_bill(path, rows, seed=0, extra_sheets=0, claims_every=997, special_every=1499):
+    """写入一个账单文件（只写模式，内存占用与行数无关）
+
+    claims_every / special_every 为理赔、特殊单票折扣行的间隔，0表示不生成
+    """
+    rng = random.Random(seed)
+    wb = openpyxl.Workbook(write_only=True)
+    overview = wb.create_sheet("账单总览")
+    detail = wb.create_sheet("账单明细")
+
+    # 先写账单明细，账单总览金额使用明细的应付金额合计
+    payable = None
+    for values in _detail_rows(rng, rows, claims_every, special_every):
+        detail.append(values)
+        if values and values[0] == "合计":
+            payable = values[8]
+
+    account = f"02{rng.randint(10000000, 99999999)}"
+    for values in _overview_rows(account, "2024-05-01至2024-05-31", payable):
+        overview.append(values)
+    overview.merged_cells.add("D6:G6")
+    overview.merged_cells.add("D7:G7")
+    overview.merged_cells.add("J17:L17")
+
+    for number in range(1, extra_sheets + 1):
+        # 其他工作表（如增值服务明细），提取时不会读取
+        extra = wb.create_sheet(f"附表{number}")
+        extra.append(["服务项目", "费用(元)"])
+        for _ in range(min(rows, 1000)):
+            extra.append([rng.choice(SERVICES), round(rng.uniform(1, 50), 2)])
+
+    wb.save(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="生成模拟的供销云仓账单文件")
+    parser.add_argument("rows", type=int, help="账单明细的行数")
+    parser.add_argument("-o", "--output", required=True, help="输出的xlsx文件")
+    parser.add_argument("--seed", type=int, default=0, help="随机数种子")
+    parser.add_argument("--extra-sheets", type=int, default=0, help="额外工作表的数量")
+    args = parser.parse_args(argv)
+    generate_bill(args.output, args.rows, seed=args.seed, extra_sheets=args.extra_sheets)
+    print(f"已生成 {args.output}（{args.rows} 行明细）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,406 @@
+"""账单提取HTTP服务（不依赖Streamlit），供其他系统调用
+
+示例：
+    python bill_server.py --port 8765 -j 4
+    curl --data-binary @账单.xlsx "http://127.0.0.1:8765/extract?name=账单.xlsx"
+    curl -F file=@账单1.xlsx -F file=@账单2.xlsx http://127.0.0.1:8765/batch
+    curl http://127.0.0.1:8765/metrics
+"""
+import argparse
+import datetime
+import json
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from batch_runner import DEFAULT_TIMEOUT, WorkerPool, default_workers
+
+
+# 排队等待处理的文件数上限（不包括正在处理的文件），超出时拒绝请求
+DEFAULT_QUEUE_SIZE = 32
+
+# 请求体大小上限（MB）
+DEFAULT_MAX_BODY_MB = 100
+
+# 吞吐量按最近多少秒内完成的文件计算
+THROUGHPUT_WINDOW = 60
+
+# 计算延迟分位数时保留的最近样本数
+LATENCY_SAMPLES = 1000
+
+# 拒绝请求时建议客户端重试的间隔（秒）
+RETRY_AFTER = 1
+
+
+class Overloaded(Exception):
+    """服务已满负荷（正在处理和排队的文件数达到上限）"""
+
+
+def _json_default(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return str(value)
+
+
+def percentiles(samples, points=(50, 90, 99)):
+    """按最近邻秩计算分位数，没有样本时为None"""
+    ordered = sorted(samples)
+    values = {}
+    for point in points:
+        if ordered:
+            rank = max(1, -(-point * len(ordered) // 100))  # 向上取整
+            values[f"p{point}"] = round(ordered[rank - 1], 6)
+        else:
+            values[f"p{point}"] = None
+    values["max"] = round(ordered[-1], 6) if ordered else None
+    values["count"] = len(ordered)
+    return values
+
+
+class ServiceMetrics:
+    """请求数、拒绝数、文件处理结果、吞吐量和延迟分位数（只保留最近的样本）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.monotonic()
+        self.requests = 0
+        self.rejected = 0
+        self.bad_requests = 0  # 请求无效（400、411），未处理
+        self.too_large = 0  # 请求体或文件数超出上限（413），未处理
+        self.files_ok = 0
+        self.files_error = 0
+        self._request_seconds = deque(maxlen=LATENCY_SAMPLES)
+        self._file_seconds = deque(maxlen=LATENCY_SAMPLES)
+        self._completed = deque()  # 完成时间，用于计算吞吐量
+
+    def record_request(self, seconds, rejected=False):
+        with self._lock:
+            self.requests += 1
+            if rejected:
+                self.rejected += 1
+            else:
+                self._request_seconds.append(seconds)
+
+    def record_invalid(self, status):
+        with self._lock:
+            self.requests += 1
+            if status == 413:
+                self.too_large += 1
+            else:
+                self.bad_requests += 1
+
+    def record_file(self, seconds, ok):
+        now = time.monotonic()
+        with self._lock:
+            if ok:
+                self.files_ok += 1
+            else:
+                self.files_error += 1
+            self._file_seconds.append(seconds)
+            self._completed.append(now)
+            self._expire(now)
+
+    def _expire(self, now):
+        while self._completed and self._completed[0] < now - THROUGHPUT_WINDOW:
+            self._completed.popleft()
+
+    def snapshot(self):
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            window = min(THROUGHPUT_WINDOW, now - self.started) or 1
+            return {
+                "uptime_seconds": round(now - self.started, 3),
+                "requests": self.requests,
+                "rejected": self.rejected,
+                "bad_requests": self.bad_requests,
+                "too_large": self.too_large,
+                "files_ok": self.files_ok,
+                "files_error": self.files_error,
+                "throughput_files_per_second": round(len(self._completed) / window, 3),
+                "request_latency_seconds": percentiles(self._request_seconds),
+                "file_latency_seconds": percentiles(self._file_seconds),
+            }
+
+
+class ExtractionService:
+    """有界的提取服务：workers个常驻解析进程，最多queue_size个文件排队，超出时拒绝（Overloaded）
+
+    每个解析进程由一个分派线程从队列中取文件处理；超时、进程异常退出的处理与WorkerPool一致
+    """
+
+    def __init__(self, workers=None, queue_size=DEFAULT_QUEUE_SIZE, timeout=DEFAULT_TIMEOUT, **processor_options):
+        self.workers = max(1, workers or default_workers())
+        self.capacity = self.workers + queue_size
+        self.metrics = ServiceMetrics()
+        self._tasks = queue.Queue()
+        self._lock = threading.Lock()
+        self._admitted = 0  # 正在处理和排队的文件数
+        self._pools = [
+            WorkerPool(max_workers=1, timeout=timeout, **processor_options).warm() for _ in range(self.workers)
+        ]
+        self._threads = [
+            threading.Thread(target=self._dispatch, args=(pool,), daemon=True) for pool in self._pools
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    @property
+    def admitted(self):
+        return self._admitted
+
+    def reserve(self):
+        """读取请求体之前预留一个文件的容量，已满负荷时抛出Overloaded；
+        之后提交时计入该批次（submit的reserved），不提交时须release"""
+        with self._lock:
+            if self._admitted >= self.capacity:
+                raise Overloaded(f"服务繁忙：正在处理和排队的文件已有 {self._admitted} 个（上限 {self.capacity}）")
+            self._admitted += 1
+
+    def release(self, count=1):
+        with self._lock:
+            self._admitted -= count
+
+    def submit(self, files, reserved=0):
+        """提交一批文件 [(file_name, file_bytes), ...]，返回对应的Future；
+        reserved为已为该批次预留的文件数，加上已接受的文件后超出容量时整批拒绝（预留的容量仍由调用方释放）"""
+        with self._lock:
+            extra = len(files) - reserved
+            if self._admitted + extra > self.capacity:
+                raise Overloaded(f"服务繁忙：正在处理和排队的文件已有 {self._admitted} 个（上限 {self.capacity}）")
+            self._admitted += extra
+        futures = []
+        for file_name, file_bytes in files:
+            future = Future()
+            self._tasks.put((future, file_name, file_bytes))
+            futures.append(future)
+        return futures
+
+    def _dispatch(self, pool):
+        while True:
+            task = self._tasks.get()
+            if task is None:
+                break
+            future, file_name, file_bytes = task
+            start = time.perf_counter()
+            try:
+                outcome = pool.map_files([(file_name, file_bytes)])[0]
+            except Exception as e:
+                outcome = ("error", f"处理文件时出错: {str(e)}")
+            finally:
+                with self._lock:
+                    self._admitted -= 1
+            self.metrics.record_file(time.perf_counter() - start, outcome[0] == "ok")
+            future.set_result(outcome)
+
+    def close(self):
+        for _ in self._threads:
+            self._tasks.put(None)
+        for thread in self._threads:
+            thread.join()
+        for pool in self._pools:
+            pool.close()
+
+
+class BillRequestHandler(BaseHTTPRequestHandler):
+    """POST /extract（请求体为文件内容）、POST /batch（multipart/form-data）、GET /metrics、GET /health"""
+
+    server_version = "ShunfengBill/1.0"
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False, default=_json_default).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _reject(self, message):
+        # 未读取请求体，响应后关闭连接
+        self.close_connection = True
+        self._send_json(503, {"error": message}, {"Retry-After": str(RETRY_AFTER), "Connection": "close"})
+
+    def _invalid(self, status, message):
+        """请求无效或超出上限，不处理（计入bad_requests或too_large）"""
+        self._send_json(status, {"error": message})
+        self.service.metrics.record_invalid(status)
+
+    def _read_body(self):
+        """读取请求体；长度缺失、无效或超出上限时返回None（已发送错误响应）"""
+        length = self.headers.get("Content-Length")
+        if length is None:
+            self.close_connection = True
+            self._invalid(411, "缺少Content-Length")
+            return None
+        try:
+            length = int(length)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.close_connection = True
+            self._invalid(400, "Content-Length无效")
+            return None
+        if length > self.server.max_body:
+            self.close_connection = True
+            self._invalid(413, f"请求体超过上限（{self.server.max_body // (1024 * 1024)}MB）")
+            return None
+        return self.rfile.read(length)
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path == "/metrics":
+            metrics = self.service.metrics.snapshot()
+            metrics.update(workers=self.service.workers, capacity=self.service.capacity,
+                           admitted=self.service.admitted)
+            self._send_json(200, metrics)
+        elif path == "/health":
+            self._send_json(200, {"status": "ok"})
+        else:
+            self._send_json(404, {"error": "未知的路径"})
+
+    def do_POST(self):
+        start = time.perf_counter()
+        url = urlsplit(self.path)
+        if url.path not in ("/extract", "/batch"):
+            self._send_json(404, {"error": "未知的路径"})
+            return
+        # 读取请求体之前先预留容量，已满负荷时不读取请求体，直接拒绝；
+        # 同时读取的请求体因此不超过容量个
+        try:
+            self.service.reserve()
+        except Overloaded:
+            self._reject("服务繁忙，请稍后重试")
+            self.service.metrics.record_request(time.perf_counter() - start, rejected=True)
+            return
+        futures = None
+        try:
+            body = self._read_body()
+            if body is None:
+                return
+
+            if url.path == "/extract":
+                # 文件名取自查询参数name或请求头X-File-Name（URL编码）
+                name = parse_qs(url.query).get("name", [None])[0] or unquote(self.headers.get("X-File-Name", ""))
+                files = [(name or "upload.xlsx", body)]
+            else:
+                files = self._parse_multipart(body)
+                if files is None:
+                    return
+
+            try:
+                futures = self.service.submit(files, reserved=1)
+            except Overloaded as e:
+                self._reject(str(e))
+                self.service.metrics.record_request(time.perf_counter() - start, rejected=True)
+                return
+        finally:
+            if futures is None:
+                self.service.release()
+        outcomes = [future.result() for future in futures]
+
+        if url.path == "/extract":
+            status, payload = outcomes[0]
+            if status == "ok":
+                self._send_json(200, payload)
+            else:
+                self._send_json(422, {"文件名": files[0][0], "error": payload.split("Traceback")[0].strip()})
+        else:
+            items = []
+            for (file_name, _), (status, payload) in zip(files, outcomes):
+                if status == "ok":
+                    items.append({"文件名": file_name, "status": "ok", "result": payload})
+                else:
+                    items.append({"文件名": file_name, "status": "error", "error": payload.split("Traceback")[0].strip()})
+            self._send_json(200, {"results": items})
+        self.service.metrics.record_request(time.perf_counter() - start)
+
+    def _parse_multipart(self, body):
+        """解析multipart/form-data中的文件，返回 [(file_name, file_bytes), ...]"""
+        content_type = self.headers.get("Content-Type", "")
+        if not content_type.startswith("multipart/form-data"):
+            self._invalid(400, "批量接口需要multipart/form-data")
+            return None
+        message = BytesParser(policy=HTTP).parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode("latin-1") + body)
+        files = []
+        for part in message.iter_parts():
+            file_name = part.get_filename()
+            if file_name:
+                files.append((file_name, part.get_payload(decode=True)))
+        if not files:
+            self._invalid(400, "请求中没有文件")
+            return None
+        if len(files) > self.service.capacity:
+            self._invalid(413, f"一次最多提交 {self.service.capacity} 个文件")
+            return None
+        return files
+
+
+def create_server(service, host="127.0.0.1", port=8765, max_body_mb=DEFAULT_MAX_BODY_MB, quiet=False):
+    """创建HTTP服务（port为0时使用任一空闲端口，实际端口见server.server_address）"""
+    server = ThreadingHTTPServer((host, port), BillRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    server.max_body = max_body_mb * 1024 * 1024
+    server.quiet = quiet
+    return server
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="供销云仓账单提取HTTP服务")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址（默认只接受本机访问）")
+    parser.add_argument("--port", type=int, default=8765, help="监听端口")
+    parser.add_argument("-j", "--workers", type=int, default=default_workers(), help="解析进程数，默认为CPU核数")
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE,
+                        help="排队等待的文件数上限，超出时返回503")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="单个文件超时（秒）")
+    parser.add_argument("--max-body-mb", type=int, default=DEFAULT_MAX_BODY_MB, help="请求体大小上限（MB）")
+    parser.add_argument("--full-mode", action="store_true", help="使用openpyxl完整模式读取（默认流式读取）")
+    parser.add_argument("--no-fast", action="store_true", help="不使用轻量级XLSX解析器")
+    parser.add_argument("--calamine", action="store_true", help="xlsx优先使用calamine读取（需要安装python-calamine）")
+    parser.add_argument("-q", "--quiet", action="store_true", help="不输出访问日志")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    service = ExtractionService(
+        workers=args.workers,
+        queue_size=args.queue_size,
+        timeout=args.timeout,
+        streaming=not args.full_mode,
+        fast=not args.no_fast,
+        calamine=args.calamine,
+    )
+    server = create_server(service, args.host, args.port, args.max_body_mb, args.quiet)
+    host, port = server.server_address[:2]
+    print(f"账单提取服务已启动: http://{host}:{port}（{service.workers} 个解析进程，最多 {args.queue_size} 个文件排队）",
+          file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
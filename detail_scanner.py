@@ -0,0 +1,341 @@
+import re
+from collections import deque
+
+
+# 用于清理数字字符串中的货币符号、括号等
+_NON_NUMERIC = re.compile(r'[^\d.-]')
+_DIGITS = re.compile(r'\d+')
+
+# 关键字扫描的列范围（A到S列）
+KEYWORD_COLUMNS = 19
+
+# 表头查找范围：汇总数据标题在前29行中查找，"服务"标题行在前9行中
+HEADER_ROWS = 29
+
+
+def is_valid_number(value):
+    """检查值是否为有效数字"""
+    if value is None:
+        return False
+
+    try:
+        # 如果是字符串，尝试转换为浮点数
+        if isinstance(value, str):
+            # 去除可能的货币符号、括号等
+            cleaned_value = _NON_NUMERIC.sub('', value)
+            if cleaned_value:  # 确保不是空字符串
+                float(cleaned_value)
+                return True
+            return False
+        # 直接检查是否为数字类型
+        return isinstance(value, (int, float))
+    except (ValueError, TypeError):
+        return False
+
+
+def parse_number(value):
+    """将单元格值解析为浮点数，无法解析时返回None（只清理一次字符串）"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        cleaned_value = _NON_NUMERIC.sub('', value)
+        if not cleaned_value:
+            return None
+        try:
+            return float(cleaned_value)
+        except ValueError:
+            return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    return None
+
+
+def _cell(values, column):
+    """按列号（从1开始）取行中的值，超出范围时返回None"""
+    if column <= len(values):
+        return values[column - 1]
+    return None
+
+
+def _has_service_header(values):
+    """当月单量的标题行：前14列中有包含"服务"的单元格"""
+    for cell_value in values[:14]:
+        if cell_value and isinstance(cell_value, str) and "服务" in cell_value:
+            return True
+    return False
+
+
+# 汇总数据的标题：费用(元)、折扣/促销、应付金额
+def _is_fee_header(value):
+    return isinstance(value, str) and "费用" in value and ("元" in value or "¥" in value)
+
+
+def _is_discount_header(value):
+    return isinstance(value, str) and ("折扣" in value or "促销" in value)
+
+
+def _is_payable_header(value):
+    return isinstance(value, str) and "应付" in value and "金额" in value
+
+
+def _contains_keyword(values, keywords):
+    """检查行的前19列中是否有字符串包含任一关键字"""
+    for cell_value in values[:KEYWORD_COLUMNS]:
+        if cell_value and isinstance(cell_value, str):
+            for keyword in keywords:
+                if keyword in cell_value:
+                    return True
+    return False
+
+
+class FreightCountExtractor:
+    """当月单量：统计标题行之后N列值为"运费"的行数，并保留原有的备选方法"""
+
+    n_column = 14  # N列
+    window = 9  # 备选方法在标题行之后的9行内查找"运费"列
+
+    def __init__(self):
+        self.header_row = None
+        self.n_count = 0
+        # 备选方法：标题行之后窗口内出现"运费"的列及其计数
+        self.window_counts = {}
+        self.freight_col = None
+        self.freight_col_count = 0
+        self.window_closed = False
+        # 最终备选：A列中的数字和非空行数
+        self.track_a_column = True
+        self.a_max = None
+        self.a_non_empty = 0
+
+    def feed(self, row, values):
+        if self.header_row is None:
+            if row < 10 and _has_service_header(values):
+                self.header_row = row
+        elif row > self.header_row:
+            n_value = _cell(values, self.n_column)
+            if n_value and isinstance(n_value, str) and n_value.strip() == "运费":
+                self.n_count += 1
+                self.track_a_column = False
+
+            if self.n_count == 0:
+                if row <= self.header_row + self.window:
+                    for col, cell_value in enumerate(values, 1):
+                        if cell_value and isinstance(cell_value, str) and cell_value.strip() == "运费":
+                            self.window_counts[col] = self.window_counts.get(col, 0) + 1
+                else:
+                    if not self.window_closed:
+                        self._close_window()
+                    if self.freight_col:
+                        cell_value = _cell(values, self.freight_col)
+                        if cell_value and isinstance(cell_value, str) and cell_value.strip() == "运费":
+                            self.freight_col_count += 1
+
+        if self.track_a_column and row >= 2:
+            self._feed_a_column(values[0] if values else None)
+
+    def _close_window(self):
+        self.window_closed = True
+        if self.window_counts:
+            self.freight_col = min(self.window_counts)
+            self.freight_col_count = self.window_counts[self.freight_col]
+            self.track_a_column = False
+
+    def _feed_a_column(self, cell_value):
+        if cell_value is None:
+            return
+        self.a_non_empty += 1
+        try:
+            if isinstance(cell_value, str):
+                numbers = _DIGITS.findall(cell_value)
+                if numbers:
+                    number = int(numbers[0])
+                else:
+                    return
+            elif isinstance(cell_value, (int, float)):
+                number = int(cell_value)
+            else:
+                return
+        except (ValueError, TypeError):
+            return
+        if self.a_max is None or number > self.a_max:
+            self.a_max = number
+
+    def result(self, max_row):
+        if self.n_count > 0:
+            return self.n_count
+        if self.header_row and not self.window_closed:
+            self._close_window()
+        if self.freight_col:
+            return self.freight_col_count
+        if self.a_max is not None:
+            return self.a_max
+        return self.a_non_empty
+
+
+class SummaryRowExtractor:
+    """费用(元)、折扣/促销、应付金额：从最后50行中的合计行读取汇总值"""
+
+    header_rows = HEADER_ROWS  # 在前29行中查找标题
+    tail_rows = 51  # 合计行及其前一行都落在最后51行内
+
+    def __init__(self):
+        self.header_row = None
+        self.fee_col = None
+        self.discount_col = None
+        self.payable_col = None
+        self.tail = deque(maxlen=self.tail_rows)
+
+    def feed(self, row, values):
+        if row <= self.header_rows:
+            for col, header_value in enumerate(values[:KEYWORD_COLUMNS], 1):
+                if header_value and isinstance(header_value, str):
+                    # 查找与费用(元)、折扣/促销、应付金额相关的标题
+                    if _is_fee_header(header_value):
+                        self.fee_col = col
+                        self.header_row = row
+                    if _is_discount_header(header_value):
+                        self.discount_col = col
+                    if _is_payable_header(header_value):
+                        self.payable_col = col
+        self.tail.append((row, values))
+
+    def result(self, max_row):
+        total_fee = None
+        total_discount = None
+        total_payable = None
+
+        rows = dict(self.tail)
+        search_start = max(2, max_row - 50)
+
+        # 先查找包含"合计"或者"总计"的行（从下往上）
+        total_rows = [
+            row for row in range(max_row, search_start, -1)
+            if _contains_keyword(rows.get(row, ()), ("合计", "合 计", "总计"))
+        ]
+
+        for row in total_rows:
+            values = rows.get(row, ())
+            fee_col = self.fee_col
+            discount_col = self.discount_col
+            payable_col = self.payable_col
+
+            # 如果找到了标题行和至少一个相关列，根据标题位置查找对应的汇总值
+            use_header = self.header_row and (fee_col or discount_col or payable_col)
+            if not use_header:
+                # 如果没有找到标题行，则检查合计行的前一行是否有标题文本
+                prev_values = rows.get(row - 1, ())
+                for c, col_header in enumerate(prev_values[:KEYWORD_COLUMNS], 1):
+                    if col_header and isinstance(col_header, str):
+                        if _is_fee_header(col_header):
+                            fee_col = c
+                        if _is_discount_header(col_header):
+                            discount_col = c
+                        if _is_payable_header(col_header):
+                            payable_col = c
+
+            # 根据找到的列获取对应的汇总值
+            if fee_col:
+                fee_value = _cell(values, fee_col)
+                if is_valid_number(fee_value) and total_fee is None:
+                    total_fee = fee_value
+            if discount_col:
+                discount_value = _cell(values, discount_col)
+                if is_valid_number(discount_value) and total_discount is None:
+                    total_discount = discount_value
+            if payable_col:
+                payable_value = _cell(values, payable_col)
+                if is_valid_number(payable_value) and total_payable is None:
+                    total_payable = payable_value
+
+            if use_header:
+                continue
+
+            # 如果仍然没有找到主要字段，则尝试从合计行向右查找数值
+            if not all([total_fee, total_payable]):
+                for right_col in range(1, 20):
+                    right_value = _cell(values, right_col)
+                    if is_valid_number(right_value):
+                        # 找到了数值，根据位置依次分配
+                        if total_fee is None:
+                            total_fee = right_value
+                            continue
+                        if total_discount is None:
+                            total_discount = right_value
+                            continue
+                        if total_payable is None:
+                            total_payable = right_value
+                            break
+
+        return {
+            "total_fee": total_fee,
+            "total_discount": total_discount,
+            "total_payable": total_payable,
+        }
+
+
+class ClaimsExtractor:
+    """理赔费用合计：存在"理赔"相关单元格时，取H列中最小的负值"""
+
+    column = 8  # H列
+
+    def __init__(self):
+        self.has_claims = False
+        self.minimum = None
+
+    def feed(self, row, values):
+        if not self.has_claims and _contains_keyword(values, ("理赔",)):
+            self.has_claims = True
+        if row >= 2:  # 从第2行开始，跳过表头
+            number = parse_number(_cell(values, self.column))
+            if number is not None and number < 0 and (self.minimum is None or number < self.minimum):
+                self.minimum = number
+
+    def result(self, max_row):
+        if self.has_claims:
+            return self.minimum
+        return None
+
+
+class SpecialDiscountExtractor:
+    """特殊单票折扣：存在"特殊单票折扣"相关单元格时，取D列中最大的数字"""
+
+    column = 4  # D列
+
+    def __init__(self):
+        self.has_special_discount = False
+        self.maximum = None
+
+    def feed(self, row, values):
+        if not self.has_special_discount and _contains_keyword(values, ("特殊单票折扣",)):
+            self.has_special_discount = True
+        if row >= 2:  # 从第2行开始，跳过表头
+            number = parse_number(_cell(values, self.column))
+            if number is not None and (self.maximum is None or number > self.maximum):
+                self.maximum = number
+
+    def result(self, max_row):
+        if self.has_special_discount:
+            return self.maximum
+        return None
+
+
+class DetailSheetScanner:
+    """单次遍历账单明细：每行只访问一次，同时交给所有字段提取器处理"""
+
+    def __init__(self, extractors):
+        self.extractors = extractors
+        self.max_row = 0
+        self.cells = 0  # 遍历的单元格数（用于诊断统计）
+
+    def scan(self, rows):
+        """rows为从第1行开始、逐行连续的单元格值序列"""
+        feeds = [extractor.feed for extractor in self.extractors]
+        row = 0
+        cells = 0
+        for row, values in enumerate(rows, 1):
+            cells += len(values)
+            for feed in feeds:
+                feed(row, values)
+        self.max_row = row
+        self.cells = cells
+        return self.max_row
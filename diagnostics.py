@@ -0,0 +1,157 @@
+"""处理过程诊断：分阶段计时、结构化日志以及单个文件的性能分析
+
+示例：
+    python diagnostics.py 账单.xlsx --kind cpu -o 账单.prof
+    python diagnostics.py 账单.xlsx --kind memory -o 账单_内存.txt
+"""
+import argparse
+import cProfile
+import io
+import json
+import logging
+import marshal
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+# 每个文件的处理统计以JSON格式写入该logger（默认不输出，参见enable_stats_log）
+logger = logging.getLogger("shunfeng_bill.stats")
+
+
+class StageTimer:
+    """记录各处理阶段的耗时，以及扫描的行数、单元格数"""
+
+    def __init__(self, file_name, reader):
+        self.stats = {"file": file_name, "reader": reader, "seconds": 0.0, "stages": []}
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        """计时一个阶段；可在with块中设置返回字典的rows、cells"""
+        entry = {"stage": name}
+        start = time.perf_counter()
+        try:
+            yield entry
+        finally:
+            entry["seconds"] = round(time.perf_counter() - start, 6)
+            self.stats["stages"].append(entry)
+
+    def finish(self, error=None):
+        self.stats["seconds"] = round(time.perf_counter() - self._start, 6)
+        if error:
+            self.stats["error"] = error.split("\n")[0]
+        return self.stats
+
+
+def merge_stats(first, second):
+    """快速解析失败改用openpyxl时，合并两次尝试的统计"""
+    if first is None:
+        return second
+    merged = dict(second)
+    merged["stages"] = first["stages"] + second["stages"]
+    merged["seconds"] = round(first["seconds"] + second["seconds"], 6)
+    merged["fallback_from"] = first["reader"]
+    return merged
+
+
+def enable_stats_log(path):
+    """将每个文件的处理统计以JSON行追加写入path"""
+    handler = logging.FileHandler(path, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    return handler
+
+
+def log_stats(stats):
+    """以一行JSON记录一个文件的处理统计"""
+    if stats and logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps(stats, ensure_ascii=False, default=str))
+
+
+def stats_rows(stats_list):
+    """展开为表格行（每个阶段一行），用于诊断面板"""
+    rows = []
+    for stats in stats_list:
+        for entry in stats["stages"]:
+            rows.append({
+                "文件名": stats["file"],
+                "读取方式": stats["reader"],
+                "阶段": entry["stage"],
+                "耗时(秒)": entry["seconds"],
+                "行数": entry.get("rows"),
+                "单元格数": entry.get("cells"),
+            })
+    return rows
+
+
+def profile_file(processor, file_bytes, file_name, kind="cpu"):
+    """对单个文件做性能分析，返回 (文本报告, 原始数据)
+
+    kind="cpu" 使用cProfile，原始数据为pstats格式；
+    kind="memory" 使用tracemalloc按代码行统计内存分配，原始数据即文本报告
+    """
+    if kind == "cpu":
+        profiler = cProfile.Profile()
+        try:
+            profiler.runcall(_process_quietly, processor, file_bytes, file_name)
+        finally:
+            profiler.create_stats()
+        # pstats.Stats会取走profiler中的数据，先序列化
+        raw = marshal.dumps(profiler.stats)
+        report = io.StringIO()
+        pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(40)
+        return report.getvalue(), raw
+
+    if kind == "memory":
+        tracemalloc.start(10)
+        try:
+            _process_quietly(processor, file_bytes, file_name)
+            current, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+        finally:
+            tracemalloc.stop()
+        lines = [f"峰值内存: {peak / 1024 / 1024:.1f}MB，处理完成后仍占用: {current / 1024 / 1024:.1f}MB", ""]
+        for stat in snapshot.statistics("lineno")[:40]:
+            lines.append(str(stat))
+        report = "\n".join(lines)
+        return report, report.encode("utf-8")
+
+    raise ValueError(f"不支持的分析类型: {kind}")
+
+
+def _process_quietly(processor, file_bytes, file_name):
+    """分析时文件处理失败也要输出报告"""
+    try:
+        processor.process_excel(file_bytes, file_name)
+    except Exception as e:
+        print(f"处理文件 {file_name} 失败: {str(e).splitlines()[0]}")
+
+
+def main(argv=None):
+    from excel_processor import ExcelProcessor
+
+    parser = argparse.ArgumentParser(description="对单个账单文件做性能分析")
+    parser.add_argument("file", help="账单文件")
+    parser.add_argument("--kind", choices=["cpu", "memory"], default="cpu", help="cpu：cProfile；memory：内存分配")
+    parser.add_argument("-o", "--output", help="保存原始分析数据（cpu为.prof文件，可用snakeviz等工具查看）")
+    parser.add_argument("--full-mode", action="store_true", help="使用openpyxl完整模式读取")
+    parser.add_argument("--no-fast", action="store_true", help="不使用轻量级XLSX解析器")
+    args = parser.parse_args(argv)
+
+    with open(args.file, "rb") as f:
+        file_bytes = f.read()
+    processor = ExcelProcessor(streaming=not args.full_mode, fast=not args.no_fast)
+    report, raw = profile_file(processor, file_bytes, args.file, kind=args.kind)
+    print(report)
+    print(json.dumps(processor.stats, ensure_ascii=False, indent=2, default=str))
+    if args.output:
+        with open(args.output, "wb") as f:
+            f.write(raw)
+        print(f"分析数据已保存到 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+import importlib
+import io
+import time
+import traceback
+
+from detail_scanner import (
+    ClaimsExtractor,
+    DetailSheetScanner,
+    FreightCountExtractor,
+    SpecialDiscountExtractor,
+    SummaryRowExtractor,
+    is_valid_number,
+)
+from diagnostics import StageTimer, merge_stats
+from reader_backends import CalamineWorkbook, XlsWorkbook, calamine_available, detect_format
+from result_cache import content_hash
+from workbook_readers import OpenpyxlWorkbook
+
+
+# 提取结果的字段（与process_excel返回的字典顺序一致）
+RESULT_COLUMNS = [
+    "月结账号",
+    "账单周期",
+    "当月单量",
+    "费用(元)",
+    "折扣/促销",
+    "应付金额",
+    "理赔费用合计",
+    "账单总览金额",
+    "特殊单票折扣",
+    "文件名",
+]
+
+
+def read_source(source):
+    """文件内容：bytes直接使用；内存中的文件对象（如上传的文件）取其缓冲区，不复制"""
+    if isinstance(source, bytes):
+        return source
+    if isinstance(source, (bytearray, memoryview)):
+        return bytes(source)
+    if hasattr(source, "getvalue"):
+        # BytesIO由bytes创建且未被修改时，getvalue()直接返回原bytes对象
+        return source.getvalue()
+    source.seek(0)
+    return source.read()
+
+
+class ExcelProcessor:
+    def __init__(self, streaming=False, fast=False, calamine=False, line_items=None):
+        # streaming=True时使用只读模式逐行读取，峰值内存不随明细行数增长
+        self.streaming = streaming
+        # fast=True时优先使用轻量级XLSX解析器，无法处理时回退到openpyxl
+        self.fast = fast
+        # calamine=True时xlsx优先使用calamine读取（需要安装python-calamine），无法处理时依次回退
+        self.calamine = calamine
+        # line_items为目录时，同时将账单明细逐行导出到该目录下按月结账号、账单周期分区的Parquet数据集
+        self.line_items = line_items
+        self._line_item_key = None
+        self.monthly_account = None
+        self.billing_period = None
+        self.order_count = None
+        self.file_path = None
+        self.total_fee = None
+        self.total_discount = None
+        self.total_payable = None
+        self.total_claims = None
+        self.overview_amount = None  # 新增：账单总览金额
+        self.special_ticket_discount = None  # 新增：特殊单票折扣
+        self.stats = None  # 最近一个文件各处理阶段的耗时统计
+
+    def parser_modules(self):
+        """解析所需的较重的模块（openpyxl、pandas、pyarrow等）：导入本模块时不加载，首次处理文件时才导入"""
+        modules = ["openpyxl"]
+        if self.calamine and calamine_available():
+            modules.append("python_calamine")
+        if self.fast:
+            modules.append("fast_xlsx")
+        if self.line_items:
+            modules.append("line_items")
+        return modules
+
+    def warm_up(self):
+        """预先导入解析所需的模块，之后处理的第一个文件不再等待导入；返回所用时间（秒）"""
+        start = time.perf_counter()
+        for module in self.parser_modules():
+            importlib.import_module(module)
+        return time.perf_counter() - start
+
+    def process_excel(self, file_bytes, file_name):
+        """处理Excel文件，提取所需信息；各阶段耗时记录在self.stats中
+
+        file_bytes可以是bytes或二进制文件对象，全程直接从内存读取，不写临时文件
+        """
+        self.file_path = file_name  # 使用文件名代替完整路径
+        self.stats = None
+        fast_stats = None
+        file_bytes = read_source(file_bytes)
+        if self.line_items:
+            # 明细文件按内容哈希命名，同一账单重复导出时覆盖
+            self._line_item_key = content_hash(file_bytes)
+
+        if detect_format(file_bytes) == "xls":
+            # .xls（BIFF格式）openpyxl无法读取，由xlrd直接从文件内容读取
+            return self._process_xls(file_bytes, file_name)
+
+        readers = []
+        if self.calamine:
+            readers.append(("calamine", CalamineWorkbook))
+        if self.fast:
+            from fast_xlsx import FastXlsxWorkbook
+
+            readers.append(("fast", FastXlsxWorkbook))
+        for reader, workbook_class in readers:
+            # 优先使用快速解析器
+            timer = StageTimer(file_name, reader)
+            try:
+                with timer.stage("open_workbook"):
+                    wb = workbook_class(io.BytesIO(file_bytes))
+                result = self._extract_values(wb, file_name, timer)
+                self.stats = merge_stats(fast_stats, timer.finish())
+                return result
+            except Exception as e:
+                # 无法处理的文件依次回退到下一个解析器，最后使用openpyxl
+                fast_stats = merge_stats(fast_stats, timer.finish(str(e)))
+                print(f"使用{reader}解析文件 {file_name} 失败，改用下一个解析器: {str(e)}")
+
+        timer = StageTimer(file_name, "streaming" if self.streaming else "full")
+        try:
+            # 使用openpyxl加载工作簿以处理合并单元格（BytesIO与file_bytes共用同一块内存）
+            with timer.stage("load_workbook"):
+                wb = OpenpyxlWorkbook(io.BytesIO(file_bytes), streaming=self.streaming)
+            result = self._extract_values(wb, file_name, timer)
+            self.stats = merge_stats(fast_stats, timer.finish())
+            return result
+
+        except Exception as e:
+            self.stats = merge_stats(fast_stats, timer.finish(str(e)))
+            error_message = f"处理文件时出错: {str(e)}\n{traceback.format_exc()}"
+            raise Exception(error_message)
+
+    def _process_xls(self, file_bytes, file_name):
+        timer = StageTimer(file_name, "xls")
+        try:
+            with timer.stage("open_workbook"):
+                wb = XlsWorkbook(file_bytes)
+            result = self._extract_values(wb, file_name, timer)
+            self.stats = timer.finish()
+            return result
+        except Exception as e:
+            self.stats = timer.finish(str(e))
+            error_message = f"处理文件时出错: {str(e)}\n{traceback.format_exc()}"
+            raise Exception(error_message)
+
+    def _extract_values(self, wb, file_name, timer=None):
+        """从已打开的工作簿中提取所需信息，完成后关闭工作簿"""
+        if timer is None:
+            timer = StageTimer(file_name, "")
+        # 每个文件重新开始，避免沿用上一个文件的值
+        self.monthly_account = None
+        self.billing_period = None
+
+        try:
+            with timer.stage("overview_cells"):
+                overview_sheet = self._find_overview_sheet(wb)
+
+                # 查找合并单元格 (min_col, min_row, max_col, max_row)
+                merged_ranges = overview_sheet.merged_ranges
+
+                # 1. 获取月结账号 (从账单总览sheet的D6:G6合并单元格，D=4, G=7, 行号为6)
+                if (4, 6, 7, 6) in merged_ranges:
+                    # 从合并单元格的左上角获取值
+                    self.monthly_account = overview_sheet.value(6, 4)
+
+                # 2. 获取账单周期 (从账单总览sheet的D7:G7合并单元格)
+                if (4, 7, 7, 7) in merged_ranges:
+                    # 从合并单元格的左上角获取值
+                    self.billing_period = overview_sheet.value(7, 4)
+
+            # 3. 单次遍历账单明细：当月单量、汇总数据、理赔费用和特殊单票折扣同时提取
+            with timer.stage("scan_detail") as stage:
+                detail_sheet = self._find_detail_sheet(wb, overview_sheet)
+                freight = FreightCountExtractor()
+                summary = SummaryRowExtractor()
+                claims = ClaimsExtractor()
+                special_discount = SpecialDiscountExtractor()
+                extractors = [freight, summary, claims, special_discount]
+                line_writer = None
+                if self.line_items:
+                    from line_items import LineItemExtractor, LineItemWriter
+
+                    line_writer = LineItemWriter(self.line_items, self._line_item_key, file_name,
+                                                 self.monthly_account, self.billing_period)
+                    extractors.append(LineItemExtractor(line_writer))
+                try:
+                    scanner = DetailSheetScanner(extractors)
+                    stage["rows"] = scanner.scan(detail_sheet.iter_rows())
+                    stage["cells"] = scanner.cells
+                    if line_writer is not None:
+                        line_writer.commit()
+                        stage["line_items"] = line_writer.rows
+                except Exception:
+                    if line_writer is not None:
+                        line_writer.abort()
+                    raise
+                max_row = detail_sheet.max_row
+
+            with timer.stage("detail_results"):
+                # 当月单量 - 统计N列值为"运费"的行数，找不到时回退到备选方法
+                self.order_count = freight.result(max_row)
+
+                # 4. 获取账单明细中的汇总数据
+                self._apply_summary_values(summary, claims, max_row)
+
+                # 6. 获取特殊单票折扣
+                self._apply_special_ticket_discount(special_discount, max_row)
+
+            # 5. 获取账单总览金额 (从账单总览sheet的J17:L17合并单元格)
+            with timer.stage("overview_amount"):
+                self._find_overview_amount(overview_sheet)
+        finally:
+            with timer.stage("close_workbook"):
+                wb.close()
+
+        return {
+            "月结账号": self.monthly_account,
+            "账单周期": self.billing_period,
+            "当月单量": self.order_count,
+            "费用(元)": self.total_fee,
+            "折扣/促销": self.total_discount,
+            "应付金额": self.total_payable,
+            "理赔费用合计": self.total_claims,
+            "账单总览金额": self.overview_amount,  # 新增字段
+            "特殊单票折扣": self.special_ticket_discount,  # 新增字段
+            "文件名": file_name
+        }
+
+    def _find_overview_sheet(self, wb):
+        """查找账单总览sheet"""
+        try:
+            return wb.sheet("账单总览")
+        except KeyError:
+            # 如果没有找到账单总览，尝试找其他可能的sheet名
+            sheet_names = wb.sheetnames
+            for name in sheet_names:
+                if "总览" in name or "概览" in name:
+                    return wb.sheet(name)
+
+            # 如果仍然找不到，使用第一个sheet
+            return wb.sheet(sheet_names[0])
+
+    def _find_detail_sheet(self, wb, overview_sheet):
+        """查找账单明细sheet，找不到时返回None"""
+        try:
+            return wb.sheet("账单明细")
+        except KeyError:
+            # 如果没有找到账单明细，尝试找其他可能的sheet名
+            sheet_names = wb.sheetnames
+            for name in sheet_names:
+                if "明细" in name or "详情" in name:
+                    return wb.sheet(name)
+
+            # 如果仍然找不到，使用第一个不是总览的sheet
+            for name in sheet_names:
+                if name != overview_sheet.title:
+                    return wb.sheet(name)
+            return None
+
+    def _find_overview_amount(self, overview_sheet):
+        """获取账单总览金额（从账单总览sheet的J17:L17合并单元格）"""
+        self.overview_amount = None
+        
+        try:
+            # 首先检查J17:L17是否为合并单元格 (J=10, L=12, 行号为17)
+            if (10, 17, 12, 17) in overview_sheet.merged_ranges:
+                # 从合并单元格的左上角获取值
+                self.overview_amount = overview_sheet.value(17, 10)
+                return
+            
+            # 如果没有找到合并单元格，尝试直接获取J17单元格的值
+            self.overview_amount = overview_sheet.value(17, 10)
+            
+            # 如果还是没有找到值，尝试在总览页面寻找"合计"或"总计"附近的金额
+            if not self._is_valid_number(self.overview_amount):
+                for row in range(15, 25):  # 在15-25行范围内查找
+                    for col in range(1, 15):
+                        cell_value = overview_sheet.value(row, col)
+                        if cell_value and isinstance(cell_value, str) and ("合计" in cell_value or "总计" in cell_value):
+                            # 找到合计行，尝试在同一行的后面几列查找金额
+                            for right_col in range(col + 1, col + 5):
+                                right_value = overview_sheet.value(row, right_col)
+                                if self._is_valid_number(right_value):
+                                    self.overview_amount = right_value
+                                    return
+        except Exception as e:
+            print(f"查找账单总览金额时出错: {str(e)}")
+            traceback.print_exc()
+
+    def _find_special_ticket_discount(self, detail_sheet):
+        """查找特殊单票折扣 - 类似理赔费用的查找逻辑"""
+        special_discount = SpecialDiscountExtractor()
+        scanner = DetailSheetScanner([special_discount])
+        scanner.scan(detail_sheet.iter_rows())
+        self._apply_special_ticket_discount(special_discount, detail_sheet.max_row)
+
+    def _apply_special_ticket_discount(self, special_discount, max_row):
+        """存在"特殊单票折扣"相关单元格时，取D列中最大的数字，否则为空"""
+        self.special_ticket_discount = None
+
+        try:
+            self.special_ticket_discount = special_discount.result(max_row)
+        except Exception as e:
+            print(f"查找特殊单票折扣时出错: {str(e)}")
+            traceback.print_exc()
+
+    def _is_valid_number(self, value):
+        """检查值是否为有效数字"""
+        return is_valid_number(value)
+
+    def _find_summary_values(self, detail_sheet):
+        """查找汇总数据 - 通过搜索文本而不依赖于固定位置"""
+        summary = SummaryRowExtractor()
+        claims = ClaimsExtractor()
+        scanner = DetailSheetScanner([summary, claims])
+        scanner.scan(detail_sheet.iter_rows())
+        self._apply_summary_values(summary, claims, detail_sheet.max_row)
+
+    def _apply_summary_values(self, summary, claims, max_row):
+        """根据遍历结果填写费用、折扣、应付金额和理赔费用合计"""
+        # 初始化默认值为None，表示未找到
+        self.total_fee = None
+        self.total_discount = None
+        self.total_payable = None
+        self.total_claims = None
+
+        try:
+            # 从表格的最后50行中的合计行读取汇总数据
+            totals = summary.result(max_row)
+            self.total_fee = totals["total_fee"]
+            self.total_discount = totals["total_discount"]
+            self.total_payable = totals["total_payable"]
+
+            # 存在理赔费用相关单元格时，取H列中最小的负值
+            self.total_claims = claims.result(max_row)
+
+        except Exception as e:
+            # 记录错误但不中断程序
+            print(f"查找汇总数据时出错: {str(e)}")
+            traceback.print_exc()
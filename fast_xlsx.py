@@ -0,0 +1,329 @@
+import posixpath
+import zipfile
+import xml.etree.ElementTree as ET
+
+from openpyxl.styles.numbers import builtin_format_code, is_date_format, is_timedelta_format
+from openpyxl.utils.cell import range_boundaries
+from openpyxl.utils.datetime import CALENDAR_MAC_1904, WINDOWS_EPOCH, from_excel, from_ISO8601
+
+from workbook_readers import (
+    OVERVIEW_ROWS,
+    PKG_REL_NS,
+    SHEET_NS,
+    _merged_by_row,
+    _resolve_target,
+    read_merged_ranges,
+    read_sheet_paths,
+    read_workbook_path,
+)
+
+
+_ROW = f"{{{SHEET_NS}}}row"
+_CELL = f"{{{SHEET_NS}}}c"
+_VALUE = f"{{{SHEET_NS}}}v"
+_INLINE = f"{{{SHEET_NS}}}is"
+_TEXT = f"{{{SHEET_NS}}}t"
+_RUN = f"{{{SHEET_NS}}}r"
+_STRING_ITEM = f"{{{SHEET_NS}}}si"
+_SHEET_DATA = f"{{{SHEET_NS}}}sheetData"
+_MERGE_CELL = f"{{{SHEET_NS}}}mergeCell"
+_NUM_FMT = f"{{{SHEET_NS}}}numFmt"
+_CELL_XFS = f"{{{SHEET_NS}}}cellXfs"
+_XF = f"{{{SHEET_NS}}}xf"
+_WORKBOOK_PR = f"{{{SHEET_NS}}}workbookPr"
+
+_DIGITS = "0123456789"
+
+
+class UnsupportedWorkbookError(Exception):
+    """快速解析器无法处理该文件，应回退到openpyxl"""
+
+
+_COLUMN_INDEX = {}
+
+
+def _column_index(letters):
+    """列字母转列号（A=1），结果缓存"""
+    index = _COLUMN_INDEX.get(letters)
+    if index is None:
+        index = 0
+        for char in letters.upper():
+            index = index * 26 + ord(char) - 64
+        _COLUMN_INDEX[letters] = index
+    return index
+
+
+def _text_content(node):
+    """与openpyxl一致：取纯文本<t>与富文本<r><t>的内容（忽略注音）"""
+    parts = []
+    for child in node:
+        if child.tag == _TEXT:
+            if child.text is not None:
+                parts.append(child.text)
+        elif child.tag == _RUN:
+            text = child.find(_TEXT)
+            if text is not None and text.text is not None:
+                parts.append(text.text)
+    return "".join(parts)
+
+
+def _cast_number(value):
+    """数字字符串转为int或float（与openpyxl一致）"""
+    if "." in value or "E" in value or "e" in value:
+        return float(value)
+    return int(value)
+
+
+class FastXlsxSheet:
+    """直接解析工作表XML的视图，只读取单元格值"""
+
+    def __init__(self, book, title, path):
+        self.book = book
+        self.title = title
+        self.path = path
+        self._merged_ranges = None
+        # 合并单元格已读取时，与完整模式一致：合并区域中除左上角以外的单元格值为空
+        self._merged_by_row = {}
+        self._last_row = 0
+        self._rows = None
+        self._rows_limit = 0
+
+    @property
+    def merged_ranges(self):
+        """合并单元格 (min_col, min_row, max_col, max_row)
+
+        首次使用时才扫描工作表XML（账单总览需要）；完整遍历过的工作表（账单明细）直接使用遍历时读到的合并单元格
+        """
+        if self._merged_ranges is None:
+            self._set_merged_ranges(read_merged_ranges(self.book.archive, self.path))
+        return self._merged_ranges
+
+    def _set_merged_ranges(self, ranges):
+        self._merged_ranges = frozenset(ranges)
+        self._merged_by_row = _merged_by_row(self._merged_ranges)
+
+    @property
+    def max_row(self):
+        """与openpyxl完整模式的max_row一致（遍历完成后有效）"""
+        return max(self._last_row, max((r[3] for r in self.merged_ranges), default=0), 1)
+
+    def _parse_row(self, row_element):
+        shared_strings = self.book.shared_strings
+        date_formats = self.book.date_formats
+        values = []
+        column = 0
+        for cell in row_element:
+            if cell.tag != _CELL:
+                continue
+            ref = cell.get("r")
+            if ref:
+                column = _column_index(ref.rstrip(_DIGITS))
+            else:
+                column += 1
+
+            data_type = cell.get("t", "n")
+            if data_type == "inlineStr":
+                child = cell.find(_INLINE)
+                value = _text_content(child) if child is not None else None
+            else:
+                value = cell.findtext(_VALUE) or None
+                if value is not None:
+                    if data_type == "n":
+                        value = _cast_number(value)
+                        style_id = cell.get("s")
+                        if style_id and int(style_id) in date_formats:
+                            value = self.book.to_datetime(value, int(style_id))
+                    elif data_type == "s":
+                        value = shared_strings[int(value)]
+                    elif data_type == "b":
+                        value = bool(int(value))
+                    elif data_type == "d":
+                        value = from_ISO8601(value)
+
+            if column > len(values):
+                values.extend([None] * (column - len(values)))
+            values[column - 1] = value
+        return values
+
+    def iter_rows(self):
+        """逐行返回单元格值（从第1行开始连续），解析后的元素立即释放
+
+        合并单元格（<mergeCells>）位于所有行之后：尚未读取时不预先扫描，遍历中顺带记录，遍历完成后即可使用
+        """
+        row = 0
+        last_row = 0
+        sheet_data = None
+        merged_refs = [] if self._merged_ranges is None else None
+        try:
+            source = self.book.archive.open(self.path)
+        except KeyError as e:
+            raise UnsupportedWorkbookError(f"缺少工作表: {self.path}") from e
+        try:
+            for event, element in ET.iterparse(source, events=("start", "end")):
+                if event == "start":
+                    if element.tag == _SHEET_DATA:
+                        sheet_data = element
+                    continue
+                if element.tag == _MERGE_CELL:
+                    if merged_refs is not None and element.get("ref"):
+                        merged_refs.append(element.get("ref"))
+                    continue
+                if element.tag != _ROW:
+                    continue
+
+                ref = element.get("r")
+                row = int(float(ref)) if ref else row + 1
+                values = self._parse_row(element)
+                if sheet_data is not None:
+                    sheet_data.clear()
+
+                # 缺失的行与没有单元格的行，在其后出现内容时才补齐为空行
+                if not values:
+                    continue
+                for _ in range(row - last_row - 1):
+                    yield ()
+                if row in self._merged_by_row:
+                    for first_col, last_col in self._merged_by_row[row]:
+                        for col in range(first_col, min(last_col, len(values)) + 1):
+                            values[col - 1] = None
+                last_row = self._last_row = row
+                yield tuple(values)
+            if merged_refs is not None:
+                self._set_merged_ranges(range_boundaries(ref.upper()) for ref in merged_refs)
+        except (ET.ParseError, IndexError, ValueError) as e:
+            raise UnsupportedWorkbookError(f"无法解析工作表 {self.title}: {e}") from e
+        finally:
+            source.close()
+
+    def value(self, row, column):
+        """读取少量单元格（用于账单总览），只解析前若干行"""
+        if self._rows is None or (row > len(self._rows) and len(self._rows) == self._rows_limit):
+            # 先读取合并单元格，缓存的行与完整模式一致
+            self.merged_ranges
+            self._rows_limit = max(row, OVERVIEW_ROWS)
+            self._rows = []
+            rows = self.iter_rows()
+            for values in rows:
+                self._rows.append(values)
+                if len(self._rows) >= self._rows_limit:
+                    break
+            rows.close()
+        if row <= len(self._rows):
+            values = self._rows[row - 1]
+            if column <= len(values):
+                return values[column - 1]
+        return None
+
+
+class FastXlsxWorkbook:
+    """轻量级XLSX读取器：直接从文件内容读取，只打开所需工作表及共享字符串，
+    跳过样式对象、图片和其他工作表。无法处理的文件抛出UnsupportedWorkbookError"""
+
+    def __init__(self, source):
+        try:
+            self.archive = zipfile.ZipFile(source)
+            sheet_paths = read_sheet_paths(self.archive)
+            self._read_workbook_parts()
+        except (zipfile.BadZipFile, KeyError, ET.ParseError) as e:
+            raise UnsupportedWorkbookError(f"不是有效的xlsx文件: {e}") from e
+
+        names = set(self.archive.namelist())
+        self._sheet_paths = {name: path for name, path in sheet_paths if path in names}
+        self.sheetnames = [name for name, path in sheet_paths if path in names]
+        if not self.sheetnames:
+            raise UnsupportedWorkbookError("未找到工作表")
+        self._shared_strings = None
+        self._date_formats = None
+
+    def _read_workbook_parts(self):
+        """读取日期系统以及共享字符串、样式部件的位置"""
+        self.epoch = WINDOWS_EPOCH
+        self._strings_path = None
+        self._styles_path = None
+
+        workbook_path = read_workbook_path(self.archive)
+        workbook = ET.fromstring(self.archive.read(workbook_path))
+        workbook_pr = workbook.find(_WORKBOOK_PR)
+        if workbook_pr is not None and workbook_pr.get("date1904", "").lower() in ("1", "true"):
+            self.epoch = CALENDAR_MAC_1904
+
+        base_dir = posixpath.dirname(workbook_path)
+        rels_path = posixpath.join(base_dir, "_rels", posixpath.basename(workbook_path) + ".rels")
+        for rel in ET.fromstring(self.archive.read(rels_path)).iter(f"{{{PKG_REL_NS}}}Relationship"):
+            rel_type = rel.get("Type", "")
+            if rel_type.endswith("/sharedStrings"):
+                self._strings_path = _resolve_target(base_dir, rel.get("Target"))
+            elif rel_type.endswith("/styles"):
+                self._styles_path = _resolve_target(base_dir, rel.get("Target"))
+
+    @property
+    def shared_strings(self):
+        """共享字符串表，首次使用时流式解析"""
+        if self._shared_strings is None:
+            strings = []
+            if self._strings_path:
+                try:
+                    with self.archive.open(self._strings_path) as source:
+                        for _, node in ET.iterparse(source):
+                            if node.tag == _STRING_ITEM:
+                                strings.append(_text_content(node).replace("x005F_", ""))
+                                node.clear()
+                except (KeyError, ET.ParseError) as e:
+                    raise UnsupportedWorkbookError(f"无法解析共享字符串: {e}") from e
+            self._shared_strings = strings
+        return self._shared_strings
+
+    @property
+    def date_formats(self):
+        """只读取样式表中单元格格式的numFmtId，用于识别日期单元格"""
+        if self._date_formats is None:
+            self._date_formats = set()
+            self._timedelta_formats = set()
+            if self._styles_path:
+                try:
+                    self._read_number_formats()
+                except (KeyError, ET.ParseError) as e:
+                    raise UnsupportedWorkbookError(f"无法解析样式: {e}") from e
+        return self._date_formats
+
+    def _read_number_formats(self):
+        custom = {}
+        in_cell_xfs = False
+        index = 0
+        with self.archive.open(self._styles_path) as source:
+            for event, node in ET.iterparse(source, events=("start", "end")):
+                if node.tag == _CELL_XFS:
+                    if event == "end":
+                        break
+                    in_cell_xfs = True
+                elif event == "end" and node.tag == _NUM_FMT:
+                    custom[int(node.get("numFmtId"))] = node.get("formatCode")
+                elif event == "start" and in_cell_xfs and node.tag == _XF:
+                    num_fmt_id = int(node.get("numFmtId", 0))
+                    if num_fmt_id in custom:
+                        fmt = custom[num_fmt_id]
+                    else:
+                        fmt = builtin_format_code(num_fmt_id)
+                    if is_date_format(fmt):
+                        self._date_formats.add(index)
+                    if is_timedelta_format(fmt):
+                        self._timedelta_formats.add(index)
+                    index += 1
+
+    def to_datetime(self, value, style_id):
+        try:
+            return from_excel(value, self.epoch, timedelta=style_id in self._timedelta_formats)
+        except (OverflowError, ValueError):
+            # 与openpyxl一致：超出日期范围的值视为错误
+            return "#VALUE!"
+
+    def sheet(self, name):
+        if name not in self._sheet_paths:
+            raise KeyError(name)
+        path = self._sheet_paths[name]
+        if "/chartsheets/" in path:
+            raise UnsupportedWorkbookError(f"{name} 是图表工作表")
+        return FastXlsxSheet(self, name, path)
+
+    def close(self):
+        self.archive.close()
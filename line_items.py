@@ -0,0 +1,187 @@
+import os
+from urllib.parse import quote
+
+from detail_scanner import (
+    HEADER_ROWS,
+    KEYWORD_COLUMNS,
+    _contains_keyword,
+    _has_service_header,
+    _is_discount_header,
+    _is_fee_header,
+    _is_payable_header,
+    parse_number,
+)
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # 导出明细时才需要
+    pa = None
+
+
+# 每个行组（及每次写出）的明细行数，内存占用与账单行数无关
+DEFAULT_CHUNK_ROWS = 65536
+
+# 分区目录中表示空值的名称（与pyarrow的hive分区一致）
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+# 明细字段：(列名, 判断标题单元格的函数, 值的类型)
+DETAIL_FIELDS = [
+    ("运单号", lambda header: "运单" in header, "string"),
+    ("服务项目", lambda header: "服务" in header, "string"),
+    ("费用(元)", _is_fee_header, "float"),
+    ("折扣/促销", _is_discount_header, "float"),
+    ("应付金额", _is_payable_header, "float"),
+]
+
+# 分区字段（月结账号、账单周期统一按文本保存，保留账号开头的0）
+PARTITION_FIELDS = ["月结账号", "账单周期"]
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("导出账单明细需要安装pyarrow: pip install pyarrow")
+
+
+def line_item_schema():
+    """明细数据集的表结构：文件名、月结账号、账单周期、行号，以及各明细字段"""
+    _require_pyarrow()
+    types = {"string": pa.string(), "float": pa.float64()}
+    return pa.schema(
+        [("文件名", pa.string())]
+        + [(name, pa.string()) for name in PARTITION_FIELDS]
+        + [("行号", pa.int64())]
+        + [(name, types[kind]) for name, _, kind in DETAIL_FIELDS]
+    )
+
+
+def line_item_partitioning():
+    """按月结账号、账单周期的hive分区（月结账号=.../账单周期=...），读取时需按文本解析"""
+    _require_pyarrow()
+    return ds.partitioning(pa.schema([(name, pa.string()) for name in PARTITION_FIELDS]), flavor="hive")
+
+
+def read_line_items(dataset_dir):
+    """打开明细数据集（pyarrow Dataset），可按分区字段过滤后读取"""
+    return ds.dataset(dataset_dir, format="parquet", partitioning=line_item_partitioning())
+
+
+def _text(value):
+    return None if value is None else str(value)
+
+
+def partition_dir(dataset_dir, account, period):
+    """某个月结账号、账单周期的分区目录"""
+    parts = [
+        f"{name}={NULL_PARTITION if value is None else quote(value, safe='')}"
+        for name, value in zip(PARTITION_FIELDS, (_text(account), _text(period)))
+    ]
+    return os.path.join(dataset_dir, *parts)
+
+
+class LineItemWriter:
+    """将一个账单的明细按块写入数据集中的一个Parquet文件
+
+    先写入临时文件（以"."开头，读取数据集时忽略），commit后才替换为正式文件；
+    同一内容的账单再次导出时覆盖之前的文件
+    """
+
+    def __init__(self, dataset_dir, key, file_name, account, period, chunk_rows=DEFAULT_CHUNK_ROWS):
+        _require_pyarrow()
+        directory = partition_dir(dataset_dir, account, period)
+        self.path = os.path.join(directory, f"{key}.parquet")
+        self._temp_path = os.path.join(directory, f".{key}.parquet.{os.getpid()}.tmp")
+        self.schema = line_item_schema()
+        self.chunk_rows = chunk_rows
+        self._constants = {"文件名": file_name, "月结账号": _text(account), "账单周期": _text(period)}
+        self._columns = {name: [] for name in ["行号"] + [name for name, _, _ in DETAIL_FIELDS]}
+        self._buffered = 0
+        self._writer = None
+        self.rows = 0
+
+    def append(self, row, values):
+        """加入一行明细，values与DETAIL_FIELDS顺序一致"""
+        self._columns["行号"].append(row)
+        for (name, _, _), value in zip(DETAIL_FIELDS, values):
+            self._columns[name].append(value)
+        self._buffered += 1
+        if self._buffered >= self.chunk_rows:
+            self._flush()
+
+    def _flush(self):
+        if self._writer is None:
+            os.makedirs(os.path.dirname(self._temp_path), exist_ok=True)
+            self._writer = pq.ParquetWriter(self._temp_path, self.schema)
+        arrays = [
+            pa.array(self._columns[name] if name in self._columns else [self._constants[name]] * self._buffered,
+                     type=field.type)
+            for name, field in zip(self.schema.names, self.schema)
+        ]
+        self._writer.write_batch(pa.record_batch(arrays, schema=self.schema))
+        self.rows += self._buffered
+        for values in self._columns.values():
+            values.clear()
+        self._buffered = 0
+
+    def commit(self):
+        """写出剩余的行并替换为正式文件（没有明细时写出只有表结构的文件）"""
+        if self._buffered or self._writer is None:
+            self._flush()
+        self._writer.close()
+        os.replace(self._temp_path, self.path)
+        return self.path
+
+    def abort(self):
+        """放弃已写出的内容（例如当前解析器无法处理该文件，改用下一个解析器时）"""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        try:
+            os.remove(self._temp_path)
+        except FileNotFoundError:
+            pass
+
+
+class LineItemExtractor:
+    """账单明细逐行导出：在前29行中找到标题行（含"服务"或费用(元)标题），其后的每一行写入writer
+
+    空行和合计行不导出；金额按数字解析，无法解析时为空
+    """
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.header_row = None
+        self.columns = None  # 与DETAIL_FIELDS对应的列号，标题行中没有的字段为None
+
+    def _is_header(self, values):
+        return _has_service_header(values) or any(_is_fee_header(value) for value in values[:KEYWORD_COLUMNS])
+
+    def _read_header(self, values):
+        self.columns = []
+        for _, matches, _ in DETAIL_FIELDS:
+            column = None
+            for col, value in enumerate(values, 1):
+                if value and isinstance(value, str) and matches(value):
+                    column = col
+                    break
+            self.columns.append(column)
+
+    def feed(self, row, values):
+        if self.header_row is None:
+            if row <= HEADER_ROWS and self._is_header(values):
+                self.header_row = row
+                self._read_header(values)
+            return
+        if not values or _contains_keyword(values, ("合计", "合 计", "总计")):
+            return
+        item = []
+        for (_, _, kind), column in zip(DETAIL_FIELDS, self.columns):
+            value = values[column - 1] if column and column <= len(values) else None
+            if kind == "float":
+                value = parse_number(value)
+            elif value is not None:
+                value = str(value).strip() or None
+            item.append(value)
+        if any(value is not None for value in item):
+            self.writer.append(row, item)
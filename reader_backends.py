@@ -0,0 +1,210 @@
+import datetime
+import importlib.util
+import zipfile
+from itertools import islice
+
+from workbook_readers import OVERVIEW_ROWS, _merged_by_row, read_last_row, read_sheet_paths
+
+
+# 文件头（magic bytes）：xlsx为zip压缩包，xls为OLE2复合文档（BIFF格式）
+XLSX_MAGIC = b"PK\x03\x04"
+XLS_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+
+# 小于该值的整数值浮点数转为int：与openpyxl读取Excel保存的xlsx一致（Excel按15位有效数字写出）
+_INTEGER_LIMIT = 1e15
+
+
+def detect_format(file_bytes):
+    """按文件头判断格式，返回 "xlsx"、"xls"，无法识别时返回None"""
+    header = bytes(file_bytes[:8])
+    if header.startswith(XLSX_MAGIC):
+        return "xlsx"
+    if header == XLS_MAGIC:
+        return "xls"
+    return None
+
+
+def calamine_available():
+    """是否安装了python-calamine（可选依赖）；只查找不导入，使用calamine读取时才导入"""
+    return importlib.util.find_spec("python_calamine") is not None
+
+
+def _number(value):
+    """整数值的浮点数转为int（xlrd和calamine读出的数字都是浮点数）"""
+    if value.is_integer() and abs(value) < _INTEGER_LIMIT:
+        return int(value)
+    return value
+
+
+class XlsSheet:
+    """xls工作表视图（xlrd读取），单元格值转换为与openpyxl一致的类型"""
+
+    def __init__(self, book, sheet):
+        self.book = book
+        self.sheet = sheet
+        self.title = sheet.name
+        self.xlrd = book.xlrd
+        # xlrd的合并区域为 (起始行, 结束行+1, 起始列, 结束列+1)，从0开始
+        self.merged_ranges = frozenset(
+            (col_low + 1, row_low + 1, col_high, row_high)
+            for row_low, row_high, col_low, col_high in sheet.merged_cells
+        )
+        self._merged_by_row = _merged_by_row(self.merged_ranges)
+        self._cached_rows = {}
+
+    @property
+    def max_row(self):
+        return max(self.sheet.nrows, max((r[3] for r in self.merged_ranges), default=0), 1)
+
+    def _convert(self, cell_type, value):
+        xlrd = self.xlrd
+        if cell_type in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK):
+            return None
+        if cell_type == xlrd.XL_CELL_NUMBER:
+            return _number(value)
+        if cell_type == xlrd.XL_CELL_DATE:
+            try:
+                return self.book.from_excel(value, self.book.epoch)
+            except (OverflowError, ValueError):
+                return "#VALUE!"
+        if cell_type == xlrd.XL_CELL_BOOLEAN:
+            return bool(value)
+        if cell_type == xlrd.XL_CELL_ERROR:
+            return xlrd.error_text_from_code.get(value)
+        return value
+
+    def _row_values(self, index):
+        values = [self._convert(t, v) for t, v in zip(self.sheet.row_types(index), self.sheet.row_values(index))]
+        row = index + 1
+        # 与openpyxl一致：合并区域中除左上角以外的单元格值为空
+        for first_col, last_col in self._merged_by_row.get(row, ()):
+            for col in range(first_col, min(last_col, len(values)) + 1):
+                values[col - 1] = None
+        return tuple(values)
+
+    def iter_rows(self):
+        for index in range(self.sheet.nrows):
+            yield self._row_values(index)
+
+    def value(self, row, column):
+        """读取少量单元格（用于账单总览），每行只转换一次"""
+        if row > self.sheet.nrows:
+            return None
+        values = self._cached_rows.get(row)
+        if values is None:
+            values = self._cached_rows[row] = self._row_values(row - 1)
+        return values[column - 1] if column <= len(values) else None
+
+
+class XlsWorkbook:
+    """xls（BIFF格式）工作簿，由xlrd直接从文件内容读取，各工作表按需加载"""
+
+    def __init__(self, file_bytes):
+        # xlrd和openpyxl在首次读取xls文件时才导入，日期转换与openpyxl一致
+        try:
+            import xlrd
+        except ImportError:
+            raise ImportError("读取.xls文件需要安装xlrd: pip install xlrd") from None
+        from openpyxl.utils.datetime import CALENDAR_MAC_1904, WINDOWS_EPOCH, from_excel
+
+        self.xlrd = xlrd
+        self.from_excel = from_excel
+        # formatting_info=True时才会读取合并单元格
+        self.workbook = xlrd.open_workbook(file_contents=bytes(file_bytes), formatting_info=True, on_demand=True)
+        self.epoch = CALENDAR_MAC_1904 if self.workbook.datemode == 1 else WINDOWS_EPOCH
+        self.sheetnames = self.workbook.sheet_names()
+
+    def sheet(self, name):
+        if name not in self.sheetnames:
+            raise KeyError(name)
+        return XlsSheet(self, self.workbook.sheet_by_name(name))
+
+    def close(self):
+        self.workbook.release_resources()
+
+
+class CalamineSheet:
+    """calamine工作表视图，单元格值转换为与openpyxl一致的类型"""
+
+    def __init__(self, book, sheet):
+        self.book = book
+        self.sheet = sheet
+        self.title = sheet.name
+        # calamine的合并区域为 ((起始行, 起始列), (结束行, 结束列))，从0开始
+        self.merged_ranges = frozenset(
+            (start_col + 1, start_row + 1, end_col + 1, end_row + 1)
+            for (start_row, start_col), (end_row, end_col) in sheet.merged_cell_ranges or ()
+        )
+        self._merged_by_row = _merged_by_row(self.merged_ranges)
+        self._rows = None
+        self._last_row = None
+
+    @property
+    def max_row(self):
+        """与openpyxl完整模式的max_row一致：calamine不返回只有样式的空单元格，行号从工作表XML中读取"""
+        if self._last_row is None:
+            self._last_row = self.book.last_row(self.title)
+        return max(self._last_row, max((r[3] for r in self.merged_ranges), default=0), 1)
+
+    @staticmethod
+    def _convert(value):
+        if value == "":
+            return None
+        if isinstance(value, float):
+            return _number(value)
+        if type(value) is datetime.date:
+            # openpyxl读取的日期都是datetime
+            return datetime.datetime(value.year, value.month, value.day)
+        return value
+
+    def iter_rows(self):
+        """从A1开始逐行返回（calamine一次读取整个工作表，逐行转换单元格值）"""
+        convert = self._convert
+        for row, cells in enumerate(self.sheet.to_python(skip_empty_area=False), 1):
+            values = [convert(v) for v in cells]
+            for first, last in self._merged_by_row.get(row, ()):
+                for col in range(first, min(last, len(values)) + 1):
+                    values[col - 1] = None
+            yield tuple(values)
+
+    def value(self, row, column):
+        """读取少量单元格（用于账单总览），前若干行只转换一次并缓存"""
+        if self._rows is None or (row > len(self._rows) and len(self._rows) == self._rows_limit):
+            self._rows_limit = max(row, OVERVIEW_ROWS)
+            self._rows = list(islice(self.iter_rows(), self._rows_limit))
+        if row <= len(self._rows):
+            values = self._rows[row - 1]
+            if column <= len(values):
+                return values[column - 1]
+        return None
+
+
+class CalamineWorkbook:
+    """calamine（Rust实现）读取xlsx（路径或文件对象），需要安装可选依赖python-calamine"""
+
+    def __init__(self, source):
+        try:
+            import python_calamine
+        except ImportError:
+            raise ImportError("使用calamine需要安装python-calamine: pip install python-calamine") from None
+        self.workbook = python_calamine.CalamineWorkbook.from_object(source)
+        self.sheetnames = list(self.workbook.sheet_names)
+        self.archive = zipfile.ZipFile(source)
+        self._sheet_paths = dict(read_sheet_paths(self.archive))
+
+    def last_row(self, name):
+        sheet = self.workbook.get_sheet_by_name(name)
+        last_row = sheet.end[0] + 1 if sheet.end else 0
+        path = self._sheet_paths.get(name)
+        if path is None:
+            return last_row
+        return max(last_row, read_last_row(self.archive, path))
+
+    def sheet(self, name):
+        if name not in self.sheetnames:
+            raise KeyError(name)
+        return CalamineSheet(self, self.workbook.get_sheet_by_name(name))
+
+    def close(self):
+        self.workbook.close()
+        self.archive.close()
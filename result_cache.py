@@ -0,0 +1,82 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def content_hash(file_bytes):
+    """计算文件内容的哈希值，作为提取结果的缓存键"""
+    return hashlib.sha256(file_bytes).hexdigest()
+
+
+class ResultCache:
+    """按文件内容哈希缓存提取结果，超出容量时淘汰最久未使用的条目
+
+    可在多个线程（多个页面会话、后台分派线程）中共用
+    """
+
+    def __init__(self, max_entries=2000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        """返回缓存的条目，没有时返回None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# 处理结果的状态："ok"为成功；"error"为文件本身无法处理，重新处理结果相同；
+# "retry"为暂时的失败（超时、工作进程异常退出、读取文件失败等），重新处理可能成功
+CACHEABLE_STATUSES = ("ok", "error")
+
+
+def cached_outcome(cache, key, file_name):
+    """查找缓存的处理结果，返回 ("ok", result) 或 ("error", 错误信息)，没有时返回None"""
+    entry = cache.get(key)
+    if entry is None:
+        return None
+    status, payload = entry
+    if status != "ok":
+        return entry
+    result = dict(payload)
+    result["文件名"] = file_name  # 文件名按本次上传填写
+    return ("ok", result)
+
+
+def store_outcome(cache, key, outcome):
+    """缓存处理结果，返回是否已缓存
+
+    无法处理的文件同样缓存，避免每次重新运行都重新解析；暂时的失败（"retry"）不缓存，下次重新处理
+    """
+    status, payload = outcome
+    if status not in CACHEABLE_STATUSES:
+        return False
+    if status == "ok":
+        payload = {k: v for k, v in payload.items() if k != "文件名"}
+    cache.put(key, (status, payload))
+    return True
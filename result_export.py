@@ -0,0 +1,78 @@
+import io
+
+from excel_processor import RESULT_COLUMNS
+
+
+# 支持的导出格式（按文件扩展名）
+EXPORT_FORMATS = {
+    ".csv": "csv",
+    ".xlsx": "xlsx",
+    ".parquet": "parquet",
+}
+
+# 下载文件的MIME类型
+EXPORT_MIME_TYPES = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def results_frame(results):
+    """将提取结果列表转换为固定列顺序的DataFrame"""
+    import pandas as pd
+
+    return pd.DataFrame(results, columns=RESULT_COLUMNS)
+
+
+def _parquet_frame(df):
+    """Parquet要求每列类型一致：混合了文本和数字等类型的列统一转为文本"""
+    import pandas as pd
+
+    df = df.copy()
+    for column in df.columns:
+        if df[column].dtype != object:
+            continue
+        values = df[column].dropna()
+        if values.map(type).nunique() > 1:
+            df[column] = df[column].map(lambda v: None if pd.isna(v) else str(v))
+    return df
+
+
+def _write_xlsx(df, output):
+    """只写模式逐行写出，内存占用与行数无关"""
+    import openpyxl
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Sheet1")
+    ws.append(list(df.columns))
+    for row in df.itertuples(index=False, name=None):
+        # 与to_excel一致：缺失值写为空单元格
+        ws.append([None if _is_missing(v) else v for v in row])
+    wb.save(output)
+
+
+def _is_missing(value):
+    import pandas as pd
+
+    return value is None or (isinstance(value, float) and value != value) or value is pd.NaT
+
+
+def write_results(df, output, fmt):
+    """按指定格式（csv / xlsx / parquet）写出结果，output可以是路径或文件对象"""
+    if fmt == "csv":
+        # 带BOM，Excel直接打开时中文不乱码
+        df.to_csv(output, index=False, encoding="utf-8-sig")
+    elif fmt == "xlsx":
+        _write_xlsx(df, output)
+    elif fmt == "parquet":
+        _parquet_frame(df).to_parquet(output, index=False)
+    else:
+        raise ValueError(f"不支持的导出格式: {fmt}")
+
+
+def export_bytes(df, fmt):
+    """生成下载用的文件内容"""
+    output = io.BytesIO()
+    write_results(df, output, fmt)
+    return output.getvalue()
@@ -0,0 +1,98 @@
+from excel_processor import RESULT_COLUMNS
+from rollups import Rollups
+
+
+class ResultStore:
+    """会话中的提取结果：按文件名建立索引并记录内容哈希，结果表格增量维护
+
+    version在结果每次变化时加1，可用于判断基于结果生成的内容（如导出文件）是否仍然有效；
+    rollups随结果增量更新
+    """
+
+    def __init__(self):
+        self._rows = []
+        self._positions = {}  # 文件名 -> 行号
+        self._hashes = {}  # 文件名 -> 内容哈希
+        self._pending = []  # 尚未追加到表格中的新行
+        self._frame = None  # object类型的表格，保留原始值，追加时不会改变已有列的类型
+        self._display = None  # (version, 推断类型后的表格)
+        self._arrow = None  # (version, Arrow表格)
+        self.rollups = Rollups()
+        self.version = 0
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __iter__(self):
+        return iter(self._rows)
+
+    def __contains__(self, file_name):
+        return file_name in self._positions
+
+    def content_hash(self, file_name):
+        return self._hashes.get(file_name)
+
+    def add(self, result, key):
+        """加入一个文件的结果，返回 "added"、"replaced"（同名文件内容已变化）或 "unchanged" """
+        file_name = result["文件名"]
+        position = self._positions.get(file_name)
+        if position is None:
+            self._positions[file_name] = len(self._rows)
+            self._rows.append(result)
+            self._pending.append(result)
+            status = "added"
+        elif self._hashes.get(file_name) != key:
+            # 同名文件内容已变化时，用新结果替换旧结果
+            self.rollups.remove(self._rows[position])
+            self._rows[position] = result
+            built = 0 if self._frame is None else len(self._frame)
+            if position < built:
+                import pandas as pd
+
+                self._frame.iloc[position] = pd.Series(result, index=RESULT_COLUMNS, dtype=object)
+            else:
+                # 旧结果尚未追加到表格中
+                self._pending[position - built] = result
+            status = "replaced"
+        else:
+            return "unchanged"
+        self.rollups.add(result)
+        self._hashes[file_name] = key
+        self.version += 1
+        return status
+
+    def clear(self):
+        # 清除后version继续递增，避免与清除前的版本混淆
+        version = self.version
+        self.__init__()
+        self.version = version + 1
+
+    def frame(self):
+        """结果表格；只追加新行，结果未变化时直接返回上次的表格"""
+        if self._display is not None and self._display[0] == self.version:
+            return self._display[1]
+        import pandas as pd
+
+        if self._pending or self._frame is None:
+            new_rows = pd.DataFrame(self._pending, columns=RESULT_COLUMNS, dtype=object)
+            if self._frame is None:
+                self._frame = new_rows
+            else:
+                self._frame = pd.concat([self._frame, new_rows], ignore_index=True)
+            self._pending = []
+        # 与直接由结果列表构建的表格一致：数字、日期列转为对应类型
+        display = self._frame.infer_objects()
+        self._display = (self.version, display)
+        return display
+
+    def arrow_table(self):
+        """结果表格转换的Arrow表格（结果变化后才重新转换），混合了文本和数字等类型的列统一为文本"""
+        if self._arrow is not None and self._arrow[0] == self.version:
+            return self._arrow[1]
+        import pyarrow as pa
+
+        from result_export import _parquet_frame
+
+        table = pa.Table.from_pandas(_parquet_frame(self.frame()), preserve_index=False)
+        self._arrow = (self.version, table)
+        return table
@@ -0,0 +1,137 @@
+import datetime
+import json
+import os
+import sqlite3
+import time
+from contextlib import closing
+
+from excel_processor import RESULT_COLUMNS
+
+
+# 结果库的默认位置
+DEFAULT_RESULTS_DB = os.path.join(os.path.expanduser("~"), ".cache", "shunfeng_bill", "results.sqlite3")
+
+# 按内容哈希批量查询时，每次查询的哈希个数（SQLite参数个数有上限）
+_QUERY_CHUNK = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    content_hash TEXT PRIMARY KEY,
+    account TEXT,
+    period TEXT,
+    file_name TEXT,
+    payload TEXT NOT NULL,
+    stored_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_account_period ON results (account, period);
+CREATE INDEX IF NOT EXISTS results_period ON results (period);
+"""
+
+
+def _encode(value):
+    """json.dumps的default：日期时间保留类型，其他无法序列化的值转为文本"""
+    if isinstance(value, datetime.datetime):
+        return {"$datetime": value.isoformat()}
+    return str(value)
+
+
+def _decode(obj):
+    if "$datetime" in obj and len(obj) == 1:
+        return datetime.datetime.fromisoformat(obj["$datetime"])
+    return obj
+
+
+def _key_text(value):
+    """月结账号、账单周期的索引值（日期等统一转为文本）"""
+    return None if value is None else str(value)
+
+
+class ResultsDatabase:
+    """持久保存提取结果的SQLite数据库，按内容哈希、月结账号和账单周期建立索引
+
+    只保存成功提取的结果；每次操作单独打开连接，可在多个线程（页面会话、后台任务）中使用
+    """
+
+    def __init__(self, path=DEFAULT_RESULTS_DB):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn:
+            # WAL模式下读取与写入互不阻塞
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def __len__(self):
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def _result(self, payload, file_name):
+        result = json.loads(payload, object_hook=_decode)
+        result["文件名"] = file_name
+        return {column: result.get(column) for column in RESULT_COLUMNS}
+
+    def get_many(self, content_hashes):
+        """按内容哈希查找，返回 {内容哈希: 提取结果}（不存在的哈希不在其中）"""
+        content_hashes = list(dict.fromkeys(content_hashes))
+        found = {}
+        with closing(self._connect()) as conn:
+            for start in range(0, len(content_hashes), _QUERY_CHUNK):
+                chunk = content_hashes[start:start + _QUERY_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT content_hash, payload, file_name FROM results WHERE content_hash IN ({placeholders})",
+                    chunk,
+                )
+                for content_hash, payload, file_name in rows:
+                    found[content_hash] = self._result(payload, file_name)
+        return found
+
+    def put(self, content_hash, result):
+        """保存一个文件的提取结果（同一内容哈希只保留最新的一条）"""
+        payload = json.dumps(
+            {key: value for key, value in result.items() if key != "文件名"},
+            ensure_ascii=False,
+            default=_encode,
+        )
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO results (content_hash, account, period, file_name, payload, stored_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    content_hash,
+                    _key_text(result.get("月结账号")),
+                    _key_text(result.get("账单周期")),
+                    result.get("文件名"),
+                    payload,
+                    time.time(),
+                ),
+            )
+
+    def load(self, accounts=None, periods=None):
+        """按月结账号和（或）账单周期加载历史结果，返回 [(内容哈希, 提取结果), ...]（按保存先后）"""
+        conditions = []
+        params = []
+        for column, values in (("account", accounts), ("period", periods)):
+            if values:
+                conditions.append(f"{column} IN ({','.join('?' * len(values))})")
+                params.extend(values)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                f"SELECT content_hash, payload, file_name FROM results{where} ORDER BY stored_at", params
+            ).fetchall()
+        return [(content_hash, self._result(payload, file_name)) for content_hash, payload, file_name in rows]
+
+    def accounts(self):
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT DISTINCT account FROM results WHERE account IS NOT NULL ORDER BY account")
+            return [account for (account,) in rows]
+
+    def periods(self):
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT DISTINCT period FROM results WHERE period IS NOT NULL ORDER BY period")
+            return [period for (period,) in rows]
@@ -0,0 +1,75 @@
+import math
+
+
+# 可选的每页行数
+PAGE_SIZES = [50, 100, 500]
+
+# 可按取值筛选的列
+FILTER_COLUMNS = ["月结账号", "账单周期"]
+
+
+def filter_options(table, column):
+    """某一列的全部取值（去重、排序，不含空值），用于筛选"""
+    import pyarrow.compute as pc
+
+    values = [value for value in pc.unique(table[column]).to_pylist() if value is not None]
+    return sorted(values, key=str)
+
+
+def query_table(table, filters=None, name_contains=None, sort_by=None, descending=False):
+    """在Arrow表格上筛选和排序，返回新的Arrow表格（不转换为pandas）
+
+    filters为 {列名: 取值列表}，取值列表为空时不筛选该列；name_contains为文件名包含的文本（不区分大小写）；
+    排序时空值排在最后
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    mask = None
+    for column, values in (filters or {}).items():
+        if not values:
+            continue
+        condition = pc.is_in(table[column], value_set=pa.array(values, type=table.schema.field(column).type))
+        mask = condition if mask is None else pc.and_(mask, condition)
+    if name_contains:
+        condition = pc.fill_null(pc.match_substring(table["文件名"], name_contains, ignore_case=True), False)
+        mask = condition if mask is None else pc.and_(mask, condition)
+    if mask is not None:
+        table = table.filter(mask)
+    if sort_by:
+        indices = pc.sort_indices(
+            table, sort_keys=[(sort_by, "descending" if descending else "ascending")], null_placement="at_end"
+        )
+        table = table.take(indices)
+    return table
+
+
+def page_count(rows, page_size):
+    return max(1, math.ceil(rows / page_size))
+
+
+def page_slice(table, page, page_size):
+    """第page页（从1开始）的行，只复制引用，不复制数据"""
+    return table.slice((page - 1) * page_size, page_size)
+
+
+class ResultsView:
+    """结果表格的筛选、排序和分页：筛选排序的结果按结果版本和查询条件缓存，翻页时直接取切片"""
+
+    def __init__(self):
+        self._query = None  # (结果版本, 查询条件)
+        self._result = None
+
+    def query(self, store, filters=None, name_contains=None, sort_by=None, descending=False):
+        """ResultStore中的结果按条件筛选排序后的Arrow表格"""
+        key = (
+            store.version,
+            tuple((column, tuple(values)) for column, values in (filters or {}).items()),
+            name_contains,
+            sort_by,
+            descending,
+        )
+        if key != self._query:
+            self._result = query_table(store.arrow_table(), filters, name_contains, sort_by, descending)
+            self._query = key
+        return self._result
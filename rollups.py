@@ -0,0 +1,63 @@
+from detail_scanner import parse_number
+
+
+# 汇总的金额字段
+ROLLUP_MEASURES = ["当月单量", "费用(元)", "应付金额", "理赔费用合计"]
+
+# 汇总维度
+ROLLUP_DIMENSIONS = ["月结账号", "账单周期"]
+
+# 没有识别出月结账号或账单周期的账单归入该分组
+UNKNOWN_GROUP = "（未识别）"
+
+
+def _group(value):
+    return UNKNOWN_GROUP if value is None or value == "" else str(value)
+
+
+class Rollups:
+    """按月结账号、按账单周期的合计：每个结果加入或移除时只更新所在的分组，不重新分组全部结果
+
+    无法解析为数字的字段不计入合计
+    """
+
+    def __init__(self):
+        # 维度 -> {分组: [账单数, 各字段合计...]}
+        self._totals = {dimension: {} for dimension in ROLLUP_DIMENSIONS}
+        self._frames = {}  # 维度 -> (version, 表格)
+        self.version = 0
+
+    def _update(self, result, sign):
+        amounts = [parse_number(result.get(measure)) or 0.0 for measure in ROLLUP_MEASURES]
+        for dimension, groups in self._totals.items():
+            group = _group(result.get(dimension))
+            totals = groups.setdefault(group, [0] + [0.0] * len(ROLLUP_MEASURES))
+            totals[0] += sign
+            for i, amount in enumerate(amounts, 1):
+                totals[i] += sign * amount
+            if totals[0] == 0:
+                # 分组中已没有账单
+                del groups[group]
+        self.version += 1
+
+    def add(self, result):
+        self._update(result, 1)
+
+    def remove(self, result):
+        """移除之前加入的结果（同名文件的结果被替换时）"""
+        self._update(result, -1)
+
+    def frame(self, dimension):
+        """某一维度的汇总表格，汇总未变化时直接返回上次的表格"""
+        cached = self._frames.get(dimension)
+        if cached is not None and cached[0] == self.version:
+            return cached[1]
+        import pandas as pd
+
+        rows = [
+            [group, totals[0]] + [round(total, 2) for total in totals[1:]]
+            for group, totals in sorted(self._totals[dimension].items())
+        ]
+        frame = pd.DataFrame(rows, columns=[dimension, "账单数"] + ROLLUP_MEASURES)
+        self._frames[dimension] = (self.version, frame)
+        return frame
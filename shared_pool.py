@@ -0,0 +1,327 @@
+import os
+import threading
+import traceback
+from collections import OrderedDict, deque
+
+from batch_runner import DEFAULT_TIMEOUT, WorkerPool, default_workers
+from result_cache import ResultCache, content_hash, store_outcome
+
+
+# 默认的内存预算（MB）：同时解析的文件预计占用的内存合计不超过该值
+DEFAULT_MEMORY_BUDGET_MB = 2048
+
+# 解析一个文件预计占用的内存：文件大小的倍数（按读取方式，实测峰值略向上取整）
+MEMORY_RATIO_STREAMING = 8  # 轻量级解析器或openpyxl流式读取
+MEMORY_RATIO_CALAMINE = 45  # calamine一次读入整个工作表
+MEMORY_RATIO_FULL = 80  # openpyxl完整模式
+
+# 每个文件另外预计的固定内存（MB）
+MEMORY_BASE_MB = 16
+
+# 共用的提取结果缓存的最大条目数
+SHARED_CACHE_SIZE = 5000
+
+
+def memory_ratio(streaming=True, calamine=False, **_):
+    """按处理参数确定解析时内存占用与文件大小之比"""
+    if calamine:
+        return MEMORY_RATIO_CALAMINE
+    return MEMORY_RATIO_STREAMING if streaming else MEMORY_RATIO_FULL
+
+
+def source_size(source):
+    """任务文件内容的大小（字节），无法预先得知时（读取文件的函数）返回None"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return len(source)
+    if isinstance(source, (str, os.PathLike)):
+        try:
+            return os.path.getsize(source)
+        except OSError:
+            return None
+    return None
+
+
+class _Task:
+    """一个待解析的文件（按内容哈希去重，多个会话的批次可以同时等待同一个文件）"""
+
+    def __init__(self, key, file_name, source, memory, session, hashed=True):
+        self.key = key
+        self.file_name = file_name
+        self.source = source
+        self.hashed = hashed  # False时key为临时键，开始处理时才计算内容哈希
+        self.memory = memory  # 预计占用的内存（字节）
+        self.session = session  # 排在哪个会话的队列中
+        self.batches = []  # 等待该文件结果的批次
+        self.running = False
+        self.cancel = threading.Event()
+
+
+class SharedBatch:
+    """一个会话提交的一批文件：结果按内容哈希逐个可取，可以取消"""
+
+    def __init__(self, pool, session, keys):
+        self.pool = pool
+        self.session = session
+        self.keys = list(keys)
+        self.total = len(self.keys)
+        self.outcomes = {}  # 内容哈希 -> ("ok", result)、("error", 错误信息) 或 ("retry", 错误信息)
+        self.content_keys = {}  # 临时键 -> 开始处理时计算出的内容哈希
+        self.stats = []
+        self.error = None
+        self._cancelled = False
+
+    @property
+    def finished(self):
+        return len(self.outcomes)
+
+    @property
+    def running(self):
+        return not self._cancelled and len(self.outcomes) < len(set(self.keys))
+
+    @property
+    def cancelled(self):
+        return self._cancelled
+
+    def cancel(self):
+        """取消：不再等待未完成的文件（其他会话仍在等待的文件继续处理）"""
+        self._cancelled = True
+        self.pool._withdraw(self)
+
+    def queue_position(self):
+        """(排在本批次下一个文件之前的文件数, 本批次正在解析的文件数)，参见SharedExtractionPool.queue_position"""
+        return self.pool.queue_position(self)
+
+
+class SharedExtractionPool:
+    """所有页面会话共用的解析进程池
+
+    - 同时解析的文件数不超过workers（每个常驻解析进程由一个分派线程取文件处理）；
+    - 同时解析的文件预计占用的内存合计不超过memory_budget_mb（没有文件在解析时，超出预算的文件也可以单独解析）；
+    - 每个会话一个队列，各会话轮流取文件，上传文件多的会话不会让其他会话一直等待；
+    - 提取结果缓存所有会话共用；同一内容的文件正在排队或解析时，再次提交只等待同一个结果，不重复解析。
+    """
+
+    def __init__(self, workers=None, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, timeout=DEFAULT_TIMEOUT,
+                 results_db=None, cache_size=SHARED_CACHE_SIZE, **processor_options):
+        self.workers = max(1, workers or default_workers())
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+        self.memory_ratio = memory_ratio(**processor_options)
+        self.cache = ResultCache(max_entries=cache_size)
+        self.results_db = results_db  # 成功的结果同时存入结果库（ResultsDatabase）
+        self._cond = threading.Condition()
+        self._queues = OrderedDict()  # 会话 -> 排队的文件，按轮到的先后排列
+        self._tasks = {}  # 内容哈希 -> 排队或正在解析的文件
+        self._memory_in_use = 0
+        self._closed = False
+        self._pools = [
+            WorkerPool(max_workers=1, timeout=timeout, **processor_options).warm() for _ in range(self.workers)
+        ]
+        self._threads = [threading.Thread(target=self._dispatch, args=(pool,), daemon=True) for pool in self._pools]
+        for thread in self._threads:
+            thread.start()
+
+    def estimate_memory(self, size):
+        """解析一个文件预计占用的内存（字节）；大小未知时按预算的四分之一估计"""
+        if size is None:
+            return self.memory_budget // 4
+        return MEMORY_BASE_MB * 1024 * 1024 + size * self.memory_ratio
+
+    def submit(self, session, jobs, keys, sizes=None, unhashed=()):
+        """提交一批文件 jobs = [(file_name, file_bytes、文件路径或读取文件的函数), ...]，keys为对应的内容哈希，
+        sizes为对应的文件大小（可选，用于估计内存占用），返回SharedBatch
+
+        已有缓存结果的文件立即完成；正在排队或解析的文件只等待同一个结果。
+        unhashed中的键为临时键（例如尚未解压计算哈希的压缩包中的文件，对应读取文件的函数）：开始处理时只读取一次，
+        同时计算内容哈希，已有该内容的结果（缓存或结果库）时不再解析；结果按内容哈希存入缓存和结果库，
+        batch.content_keys记录临时键对应的内容哈希
+        """
+        batch = SharedBatch(self, session, keys)
+        sizes = sizes or [None] * len(jobs)
+        unhashed = set(unhashed)
+        with self._cond:
+            for (file_name, source), key, size in zip(jobs, keys, sizes):
+                task = self._tasks.get(key)
+                if task is not None:
+                    if batch not in task.batches:
+                        task.batches.append(batch)
+                    continue
+                outcome = self.cache.get(key)
+                if outcome is not None:
+                    batch.outcomes[key] = outcome
+                    continue
+                if size is None:
+                    size = source_size(source)
+                task = self._tasks[key] = _Task(key, file_name, source, self.estimate_memory(size), session,
+                                                hashed=key not in unhashed)
+                task.batches.append(batch)
+                self._queues.setdefault(session, deque()).append(task)
+            self._cond.notify_all()
+        return batch
+
+    def _withdraw(self, batch):
+        """批次取消后，不再有批次等待的文件移出队列；正在解析的文件终止解析"""
+        with self._cond:
+            for key in set(batch.keys):
+                task = self._tasks.get(key)
+                if task is None or batch not in task.batches:
+                    continue
+                task.batches.remove(batch)
+                if task.batches:
+                    continue
+                if task.running:
+                    task.cancel.set()
+                else:
+                    del self._tasks[key]
+                    queue = self._queues[task.session]
+                    queue.remove(task)
+                    if not queue:
+                        del self._queues[task.session]
+            self._cond.notify_all()
+
+    def _admissible(self, task):
+        return self._memory_in_use == 0 or self._memory_in_use + task.memory <= self.memory_budget
+
+    def _next_task(self):
+        """轮到的会话的下一个文件；内存预算不足时等待（不越过该文件，以免大文件一直排不上）"""
+        if not self._queues:
+            return None
+        session, queue = next(iter(self._queues.items()))
+        task = queue[0]
+        if not self._admissible(task):
+            return None
+        queue.popleft()
+        # 该会话排到最后，其他会话先取
+        del self._queues[session]
+        if queue:
+            self._queues[session] = queue
+        return task
+
+    def _dispatch(self, pool):
+        while True:
+            with self._cond:
+                task = self._next_task()
+                while task is None and not self._closed:
+                    self._cond.wait()
+                    task = self._next_task()
+                if self._closed:
+                    break
+                task.running = True
+                self._memory_in_use += task.memory
+
+            def on_stats(index, file_name, stats):
+                for batch in list(task.batches):
+                    batch.stats.append(stats)
+
+            outcome, content_key = self._run(pool, task, on_stats)
+            with self._cond:
+                self._memory_in_use -= task.memory
+                task.running = False
+                batches = list(task.batches)
+                if outcome is None and batches:
+                    # 终止解析后又有批次提交了同一文件：重新排在该会话队列的最前面
+                    task.cancel = threading.Event()
+                    self._queues.setdefault(task.session, deque()).appendleft(task)
+                    batches = []
+                else:
+                    del self._tasks[task.key]
+                self._cond.notify_all()
+            if outcome is not None:
+                for batch in batches:
+                    if content_key != task.key:
+                        batch.content_keys[task.key] = content_key
+                    batch.outcomes[task.key] = outcome
+
+    def _run(self, pool, task, on_stats):
+        """解析一个文件，结果存入缓存和结果库，返回 (结果, 内容哈希)；终止解析时结果为None
+
+        读取文件失败、超时、解析进程异常退出或启动失败时结果为 ("retry", 错误信息)，不缓存，再次提交时重新解析
+        """
+        source = task.source
+        content_key = task.key
+        if not task.hashed:
+            # 临时键：读取（解压）一次，同时计算内容哈希；相同内容已有结果时不再解析
+            try:
+                source = source()
+            except Exception as e:
+                return ("retry", f"读取文件时出错: {str(e)}"), content_key
+            content_key = content_hash(source)
+            outcome = self._known_outcome(content_key)
+            if outcome is not None:
+                return outcome, content_key
+        try:
+            outcome = pool.map_files([(task.file_name, source)], on_stats=on_stats, cancel=task.cancel)[0]
+        except Exception as e:
+            # 例如解析进程启动失败
+            outcome = ("retry", f"处理文件时出错: {str(e)}")
+            traceback.print_exc()
+        if outcome is not None:
+            # 先存入缓存再移出正在解析的文件，之后提交的同一文件直接使用缓存结果（暂时的失败不缓存）
+            self._store(task.file_name, content_key, outcome)
+        return outcome, content_key
+
+    def _known_outcome(self, key):
+        """缓存或结果库中已有的结果，没有时返回None"""
+        outcome = self.cache.get(key)
+        if outcome is None and self.results_db is not None:
+            try:
+                result = self.results_db.get_many([key]).get(key)
+            except Exception as e:
+                print(f"查询结果库失败: {str(e)}")
+                traceback.print_exc()
+                result = None
+            if result is not None:
+                outcome = ("ok", result)
+                store_outcome(self.cache, key, outcome)
+        return outcome
+
+    def _store(self, file_name, key, outcome):
+        store_outcome(self.cache, key, outcome)
+        status, payload = outcome
+        if status == "ok" and self.results_db is not None:
+            try:
+                self.results_db.put(key, payload)
+            except Exception as e:
+                print(f"保存文件 {file_name} 的结果到结果库失败: {str(e)}")
+                traceback.print_exc()
+
+    def queue_position(self, batch):
+        """(排在该批次下一个文件之前的文件数, 该批次正在解析的文件数)
+
+        按各会话轮流取文件的顺序推算；该批次没有排队的文件时，前一项为None
+        """
+        with self._cond:
+            running = sum(
+                1 for key in set(batch.keys)
+                if key in self._tasks and self._tasks[key].running and batch in self._tasks[key].batches
+            )
+            queues = [list(queue) for queue in self._queues.values()]
+            ahead = 0
+            for depth in range(max(map(len, queues), default=0)):
+                for queue in queues:
+                    if depth < len(queue):
+                        if batch in queue[depth].batches:
+                            return ahead, running
+                        ahead += 1
+            return None, running
+
+    def status(self):
+        """解析进程数、正在解析和排队的文件数、排队的会话数，以及预计占用的内存（MB）"""
+        with self._cond:
+            queued = sum(len(queue) for queue in self._queues.values())
+            return {
+                "workers": self.workers,
+                "running": len(self._tasks) - queued,
+                "queued": queued,
+                "sessions": len(self._queues),
+                "memory_mb": round(self._memory_in_use / (1024 * 1024)),
+                "memory_budget_mb": round(self.memory_budget / (1024 * 1024)),
+            }
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+        for pool in self._pools:
+            pool.close()
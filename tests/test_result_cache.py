@@ -0,0 +1,16 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from result_cache import ResultCache, cached_outcome, store_outcome  # noqa: E402
+
+
+def test_store_outcome_skips_retry():
+    cache = ResultCache()
+    assert not store_outcome(cache, "k1", ("retry", "处理文件时出错: 处理超时（超过300秒）"))
+    assert cached_outcome(cache, "k1", "a.xlsx") is None
+    assert store_outcome(cache, "k2", ("error", "无法解析"))
+    assert cached_outcome(cache, "k2", "b.xlsx") == ("error", "无法解析")
+    assert store_outcome(cache, "k3", ("ok", {"文件名": "c.xlsx", "当月单量": 1}))
+    assert cached_outcome(cache, "k3", "d.xlsx") == ("ok", {"当月单量": 1, "文件名": "d.xlsx"})
@@ -0,0 +1,47 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from result_store import ResultStore  # noqa: E402
+
+
+def _result(file_name, account, count):
+    return {"文件名": file_name, "月结账号": account, "当月单量": count}
+
+
+def _check_replaced(store):
+    frame = store.frame()
+    assert len(frame) == 1
+    assert frame.loc[0, "月结账号"] == "B"
+    assert frame.loc[0, "当月单量"] == 99
+    assert store.arrow_table().column("月结账号").to_pylist() == ["B"]
+    rollup = store.rollups.frame("月结账号")
+    assert rollup["月结账号"].tolist() == ["B"]
+    assert rollup["当月单量"].tolist() == [99]
+
+
+def test_replace_before_frame_built():
+    store = ResultStore()
+    store.add(_result("a.xlsx", "A", 1), "hash1")
+    assert store.add(_result("a.xlsx", "B", 99), "hash2") == "replaced"
+    _check_replaced(store)
+
+
+def test_replace_after_frame_built():
+    store = ResultStore()
+    store.add(_result("a.xlsx", "A", 1), "hash1")
+    store.frame()
+    assert store.add(_result("a.xlsx", "B", 99), "hash2") == "replaced"
+    _check_replaced(store)
+
+
+def test_replace_pending_row_after_earlier_rows_built():
+    store = ResultStore()
+    store.add(_result("a.xlsx", "A", 1), "hash1")
+    store.frame()
+    store.add(_result("b.xlsx", "A", 2), "hash2")
+    store.add(_result("b.xlsx", "B", 3), "hash3")
+    frame = store.frame()
+    assert frame["文件名"].tolist() == ["a.xlsx", "b.xlsx"]
+    assert frame["当月单量"].tolist() == [1, 3]
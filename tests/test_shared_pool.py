@@ -0,0 +1,35 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared_pool import SharedExtractionPool  # noqa: E402
+
+
+def _wait(batch):
+    deadline = time.monotonic() + 30
+    while batch.running and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not batch.running
+
+
+def test_transient_failure_not_cached():
+    calls = []
+
+    def unreadable():
+        # 例如网络共享暂时断开
+        calls.append(1)
+        raise OSError("网络共享断开")
+
+    pool = SharedExtractionPool(workers=1)
+    try:
+        for attempt in (1, 2):
+            batch = pool.submit("session", [("a.xlsx", unreadable)], ["tmp:a"], unhashed=["tmp:a"])
+            _wait(batch)
+            assert batch.outcomes["tmp:a"][0] == "retry"
+            assert "tmp:a" not in pool.cache
+            # 再次提交时重新读取，不使用之前的失败结果
+            assert len(calls) == attempt
+    finally:
+        pool.close()
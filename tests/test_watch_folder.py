@@ -0,0 +1,38 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bill_generator import generate_bill  # noqa: E402
+from watch_folder import FolderManifest, FolderWatcher, scan_folder  # noqa: E402
+
+
+def test_scan_missing_folder_raises(tmp_path):
+    with pytest.raises(OSError):
+        scan_folder(str(tmp_path / "missing"))
+
+
+def test_offline_folder_keeps_manifest(tmp_path):
+    folder = tmp_path / "drop"
+    folder.mkdir()
+    generate_bill(str(folder / "a.xlsx"), 20)
+    output = str(tmp_path / "out")
+    watcher = FolderWatcher(str(folder), output, workers=1, settle_seconds=0, quiet=True)
+    try:
+        assert watcher.run_once() == (1, 0)
+
+        # 投递目录暂时不可访问：扫描失败，清单不变
+        offline = tmp_path / "offline"
+        folder.rename(offline)
+        with pytest.raises(OSError):
+            watcher.run_once()
+        assert list(watcher.manifest.entries) == ["a.xlsx"]
+        assert list(FolderManifest(watcher.manifest.path).entries) == ["a.xlsx"]
+
+        # 恢复后不重新处理
+        offline.rename(folder)
+        assert watcher.run_once() == (0, 0)
+    finally:
+        watcher.close()
@@ -0,0 +1,309 @@
+"""监视账单投递目录，只处理新增或修改过的账单，结果追加到输出目录（不依赖Streamlit）
+
+示例：
+    python watch_folder.py 投递目录 -o 提取结果 --interval 60 -j 4
+    python watch_folder.py 投递目录 -o 提取结果 --once     # 处理一轮后退出（可用于定时任务）
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import traceback
+
+from batch_runner import DEFAULT_TIMEOUT, WorkerPool, default_workers
+from zip_bundle import BILL_EXTENSIONS
+
+
+# 两次扫描的默认间隔（秒）
+DEFAULT_INTERVAL = 60
+
+# 修改时间在最近多少秒内的文件暂不处理（可能仍在复制中），下一轮再处理
+DEFAULT_SETTLE_SECONDS = 5
+
+# 每处理多少个文件写出一次结果和清单，中断后最多重新处理这么多文件
+DEFAULT_BATCH_SIZE = 200
+
+# 输出目录中的清单文件名（以"_"开头，读取Parquet数据集时忽略）
+MANIFEST_NAME = "_manifest.json"
+
+# 计算内容哈希时每次读取的字节数
+_CHUNK_SIZE = 1 << 20
+
+
+def file_hash(path):
+    """逐块读取计算内容哈希（与result_cache.content_hash一致）"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _raise(error):
+    raise error
+
+
+def scan_folder(folder):
+    """递归列出目录中的账单文件，返回 {相对路径: os.stat_result}（相对路径统一用"/"分隔）
+
+    投递目录或其中的子目录无法读取（例如网络共享断开）时抛出OSError，不能当作其中的文件已被删除
+    """
+    files = {}
+    for root, dirs, names in os.walk(folder, onerror=_raise):
+        dirs[:] = [name for name in dirs if not name.startswith(".")]
+        for name in names:
+            if not name.lower().endswith(BILL_EXTENSIONS) or name.startswith(("~$", ".")):
+                continue
+            path = os.path.join(root, name)
+            try:
+                files[os.path.relpath(path, folder).replace(os.sep, "/")] = os.stat(path)
+            except OSError:
+                # 扫描过程中被删除或移走
+                continue
+    return files
+
+
+class FolderManifest:
+    """已处理文件的清单（JSON文件）：相对路径 -> 大小、修改时间、内容哈希和处理结果
+
+    大小和修改时间都未变化的文件不再读取；变化了但内容哈希相同的文件（例如重新复制）只更新清单
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = self._read()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _read(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                entries = json.load(f)
+            if isinstance(entries, dict):
+                return entries
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"读取清单失败，将重新处理全部文件: {str(e)}", file=sys.stderr)
+        return {}
+
+    def unchanged(self, name, stat):
+        entry = self.entries.get(name)
+        return entry is not None and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns
+
+    def update(self, name, stat, content_hash, status=None, error=None):
+        """记录文件的当前状态；status为None时沿用之前的处理结果（内容未变化）"""
+        entry = self.entries.get(name, {})
+        entry.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns, hash=content_hash)
+        if status is not None:
+            entry.update(status=status, error=error, processed_at=time.time())
+        self.entries[name] = entry
+
+    def save(self):
+        """整体替换清单文件，中断时不会留下写了一半的清单"""
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False)
+        os.replace(temp_path, self.path)
+
+
+def write_part(output_dir, results):
+    """将一批结果写为输出目录中的一个新Parquet文件（文件名按写出时间排序）"""
+    from result_export import results_frame, write_results
+
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, f"part-{time.time_ns()}.parquet")
+    temp_path = os.path.join(output_dir, f".{os.path.basename(path)}.tmp")
+    write_results(results_frame(results), temp_path, "parquet")
+    os.replace(temp_path, path)
+    return path
+
+
+def load_results(output_dir):
+    """读取输出目录中的全部结果：同一文件（文件名为投递目录中的相对路径）处理过多次时只保留最后一次
+
+    已从投递目录中移除的文件，其结果仍然保留
+    """
+    import pandas as pd
+
+    from excel_processor import RESULT_COLUMNS
+    from result_export import results_frame
+
+    parts = sorted(name for name in os.listdir(output_dir) if name.startswith("part-") and name.endswith(".parquet"))
+    if not parts:
+        return results_frame([])
+    # 各批次中全部为空的列不参与合并（不影响其他批次中该列的类型）
+    frames = [pd.read_parquet(os.path.join(output_dir, name)).dropna(axis=1, how="all") for name in parts]
+    frame = pd.concat(frames, ignore_index=True).reindex(columns=RESULT_COLUMNS)
+    return frame.drop_duplicates("文件名", keep="last").reset_index(drop=True)
+
+
+class FolderWatcher:
+    """定期扫描投递目录，处理新增或修改过的账单，结果追加到output_dir
+
+    每批文件处理完后先写出结果，再保存清单；重新启动时按清单继续，只处理清单之后新增或修改的文件。
+    在两者之间中断时，该批文件重新启动后会再处理一次（load_results按文件名去重）。
+    处理失败的文件也记入清单，文件修改后才重新处理。
+    """
+
+    def __init__(self, folder, output_dir, manifest=None, workers=None, timeout=DEFAULT_TIMEOUT,
+                 batch_size=DEFAULT_BATCH_SIZE, settle_seconds=DEFAULT_SETTLE_SECONDS, quiet=False, **options):
+        self.folder = folder
+        self.output_dir = output_dir
+        self.manifest = FolderManifest(manifest or os.path.join(output_dir, MANIFEST_NAME))
+        self.batch_size = max(1, batch_size)
+        self.settle_seconds = settle_seconds
+        self.quiet = quiet
+        # 常驻进程池：解析进程在两轮扫描之间保持运行，不必每轮重新启动和导入解析模块
+        self.pool = WorkerPool(max_workers=workers or default_workers(), timeout=timeout, **options).warm()
+
+    def close(self):
+        self.pool.close()
+
+    def _log(self, message):
+        if not self.quiet:
+            print(message, file=sys.stderr)
+
+    def changed_files(self):
+        """扫描目录并更新清单中未变化或已删除的文件，返回需要处理的 [(相对路径, stat, 内容哈希), ...]
+
+        扫描失败时抛出OSError，清单保持不变
+        """
+        files = scan_folder(self.folder)
+        removed = [name for name in self.manifest.entries if name not in files]
+        for name in removed:
+            del self.manifest.entries[name]
+        now = time.time()
+        changed = []
+        touched = False
+        for name, stat in sorted(files.items()):
+            if self.manifest.unchanged(name, stat) or now - stat.st_mtime < self.settle_seconds:
+                continue
+            try:
+                content_hash = file_hash(os.path.join(self.folder, name))
+            except OSError as e:
+                print(f"读取文件 {name} 失败: {str(e)}", file=sys.stderr)
+                continue
+            entry = self.manifest.entries.get(name)
+            if entry is not None and entry["hash"] == content_hash:
+                # 只有修改时间变化，内容与上次处理时相同
+                self.manifest.update(name, stat, content_hash)
+                touched = True
+                continue
+            changed.append((name, stat, content_hash))
+        if removed or touched:
+            self.manifest.save()
+        if removed:
+            self._log(f"{len(removed)} 个文件已从投递目录中移除")
+        return changed
+
+    def _process_batch(self, batch):
+        jobs = [(name, os.path.join(self.folder, name)) for name, _, _ in batch]
+        outcomes = self.pool.map_files(jobs)
+        results = []
+        for (name, stat, content_hash), (status, payload) in zip(batch, outcomes):
+            if status == "ok":
+                results.append(payload)
+                self.manifest.update(name, stat, content_hash, "ok")
+            else:
+                error = payload.split("Traceback")[0].strip()
+                print(f"处理文件 {name} 失败: {error}", file=sys.stderr)
+                self.manifest.update(name, stat, content_hash, "error", error)
+        if results:
+            path = write_part(self.output_dir, results)
+            self._log(f"{len(results)} 个文件的结果已写入 {path}")
+        self.manifest.save()
+        return len(results)
+
+    def run_once(self):
+        """扫描一轮并处理新增或修改过的文件，返回 (处理成功的文件数, 处理失败的文件数)"""
+        changed = self.changed_files()
+        if not changed:
+            return 0, 0
+        self._log(f"发现 {len(changed)} 个新增或修改过的账单")
+        processed = 0
+        for start in range(0, len(changed), self.batch_size):
+            processed += self._process_batch(changed[start:start + self.batch_size])
+        return processed, len(changed) - processed
+
+    def run(self, interval=DEFAULT_INTERVAL, stop=None):
+        """持续监视，直到stop（threading.Event）被设置"""
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            try:
+                self.run_once()
+            except OSError as e:
+                # 投递目录暂时不可访问（例如网络共享断开）时下一轮重试
+                print(f"扫描投递目录失败: {str(e)}", file=sys.stderr)
+            except Exception as e:
+                # 其他错误（例如写出结果失败）同样记录后下一轮重试，不退出监视
+                print(f"处理投递目录时出错: {str(e)}", file=sys.stderr)
+                traceback.print_exc()
+            stop.wait(interval)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="监视账单投递目录，只处理新增或修改过的供销云仓账单")
+    parser.add_argument("folder", help="账单投递目录（递归扫描.xlsx和.xls文件）")
+    parser.add_argument("-o", "--output", required=True,
+                        help="输出目录：每批结果写为一个Parquet文件，清单默认也保存在该目录")
+    parser.add_argument("--manifest", help=f"清单文件路径（默认为输出目录中的{MANIFEST_NAME}）")
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL, help="扫描间隔（秒）")
+    parser.add_argument("--once", action="store_true", help="只扫描处理一轮")
+    parser.add_argument("--settle", type=float, default=DEFAULT_SETTLE_SECONDS,
+                        help="修改时间在最近多少秒内的文件留到下一轮处理（可能仍在复制中）")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="每处理多少个文件写出一次结果和清单")
+    parser.add_argument("-j", "--workers", type=int, default=default_workers(), help="解析进程数，默认为CPU核数")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="单个文件超时（秒）")
+    parser.add_argument("--full-mode", action="store_true", help="使用openpyxl完整模式读取（默认流式读取）")
+    parser.add_argument("--no-fast", action="store_true", help="不使用轻量级XLSX解析器")
+    parser.add_argument("--calamine", action="store_true", help="xlsx优先使用calamine读取（需要安装python-calamine）")
+    parser.add_argument("--line-items", metavar="DIR", help="同时将账单明细逐行导出到该目录（参见bill_cli.py）")
+    parser.add_argument("-q", "--quiet", action="store_true", help="不输出处理进度")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if not os.path.isdir(args.folder):
+        print(f"投递目录不存在: {args.folder}", file=sys.stderr)
+        return 2
+    watcher = FolderWatcher(
+        args.folder,
+        args.output,
+        manifest=args.manifest,
+        workers=args.workers,
+        timeout=args.timeout,
+        batch_size=args.batch_size,
+        settle_seconds=args.settle,
+        quiet=args.quiet,
+        streaming=not args.full_mode,
+        fast=not args.no_fast,
+        calamine=args.calamine,
+        line_items=args.line_items,
+    )
+    try:
+        if args.once:
+            _, failed = watcher.run_once()
+            return 1 if failed else 0
+        if not args.quiet:
+            print(f"正在监视 {args.folder}（清单中已有 {len(watcher.manifest)} 个文件，每 {args.interval:g} 秒扫描一次）",
+                  file=sys.stderr)
+        watcher.run(args.interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
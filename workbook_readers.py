@@ -0,0 +1,231 @@
+import posixpath
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+
+
+SHEET_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+# 账单总览只需要前若干行（月结账号、账单周期、总览金额都在前25行内）
+OVERVIEW_ROWS = 30
+
+# 合并单元格定义位于工作表XML末尾，按字节流查找即可，无需解析整个XML
+_MERGE_CELL = re.compile(rb'<(?:\w+:)?mergeCell\b[^>]*?\bref="([A-Za-z]+\d+(?::[A-Za-z]+\d+)?)"')
+# 单元格引用中的行号，用于确定工作表最后一个单元格所在的行
+_CELL_ROW = re.compile(rb'<(?:\w+:)?c\b[^>]*?\br="[A-Za-z]+(\d+)"')
+_CHUNK_SIZE = 1 << 20
+
+
+def _resolve_target(base_dir, target):
+    """将关系文件中的Target解析为压缩包内的路径"""
+    if target.startswith("/"):
+        return target.lstrip("/")
+    return posixpath.normpath(posixpath.join(base_dir, target))
+
+
+def read_workbook_path(archive):
+    """从包关系中找到工作簿部件的路径"""
+    try:
+        root_rels = ET.fromstring(archive.read("_rels/.rels"))
+    except KeyError:
+        return "xl/workbook.xml"
+    for rel in root_rels.iter(f"{{{PKG_REL_NS}}}Relationship"):
+        if rel.get("Type", "").endswith("/officeDocument"):
+            return _resolve_target("", rel.get("Target"))
+    return "xl/workbook.xml"
+
+
+def read_sheet_paths(archive):
+    """读取工作簿中各工作表的名称及其在压缩包内的XML路径（按工作簿顺序）"""
+    workbook_path = read_workbook_path(archive)
+    base_dir = posixpath.dirname(workbook_path)
+    rels_path = posixpath.join(base_dir, "_rels", posixpath.basename(workbook_path) + ".rels")
+    targets = {}
+    for rel in ET.fromstring(archive.read(rels_path)).iter(f"{{{PKG_REL_NS}}}Relationship"):
+        targets[rel.get("Id")] = _resolve_target(base_dir, rel.get("Target"))
+
+    paths = []
+    for sheet in ET.fromstring(archive.read(workbook_path)).iter(f"{{{SHEET_NS}}}sheet"):
+        paths.append((sheet.get("name"), targets.get(sheet.get(f"{{{REL_NS}}}id"))))
+    return paths
+
+
+def read_merged_ranges(archive, sheet_path):
+    """流式扫描工作表XML，返回合并单元格列表 (min_col, min_row, max_col, max_row)"""
+    # openpyxl在首次解析时才导入，导入本模块不加载openpyxl
+    from openpyxl.utils.cell import range_boundaries
+
+    ranges = []
+    tail = b""
+    with archive.open(sheet_path) as source:
+        while True:
+            chunk = source.read(_CHUNK_SIZE)
+            if not chunk:
+                break
+            data = tail + chunk
+            end = 0
+            for match in _MERGE_CELL.finditer(data):
+                ranges.append(range_boundaries(match.group(1).decode("ascii").upper()))
+                end = match.end()
+            # 保留末尾一小段，避免标签被切分在两个块之间
+            tail = data[max(end, len(data) - 256):]
+    return ranges
+
+
+def read_last_row(archive, sheet_path):
+    """流式扫描工作表XML，返回最后一个单元格（包括只有样式的空单元格）所在的行号，没有单元格时为0"""
+    last_row = 0
+    tail = b""
+    with archive.open(sheet_path) as source:
+        while True:
+            chunk = source.read(_CHUNK_SIZE)
+            if not chunk:
+                break
+            data = tail + chunk
+            # 行按顺序排列，通常只需查看每块中最后一个单元格；带命名空间前缀等情况逐个查找
+            match = _CELL_ROW.match(data, max(data.rfind(b"<c "), 0))
+            matches = [match] if match else _CELL_ROW.finditer(data)
+            end = 0
+            for match in matches:
+                last_row = max(last_row, int(match.group(1)))
+                end = match.end()
+            tail = data[max(end, len(data) - 256):]
+    return last_row
+
+
+def _merged_by_row(merged_ranges):
+    """合并区域中除左上角以外的单元格，按行号分组为 [(first_col, last_col), ...]"""
+    rows = {}
+    for min_col, min_row, max_col, max_row in merged_ranges:
+        for row in range(min_row, max_row + 1):
+            first_col = min_col + 1 if row == min_row else min_col
+            if first_col <= max_col:
+                rows.setdefault(row, []).append((first_col, max_col))
+    return rows
+
+
+class OpenpyxlSheet:
+    """完整模式：基于openpyxl普通工作表的视图"""
+
+    def __init__(self, worksheet):
+        self.worksheet = worksheet
+        self.title = worksheet.title
+        # 合并单元格构建成集合，只遍历一次
+        self.merged_ranges = frozenset(
+            (merged_range.min_col, merged_range.min_row, merged_range.max_col, merged_range.max_row)
+            for merged_range in worksheet.merged_cells.ranges
+        )
+
+    @property
+    def max_row(self):
+        return self.worksheet.max_row
+
+    def value(self, row, column):
+        return self.worksheet.cell(row=row, column=column).value
+
+    def iter_rows(self):
+        return self.worksheet.iter_rows(values_only=True)
+
+
+class StreamingSheet:
+    """流式模式：基于openpyxl只读工作表，逐行读取单元格值，内存占用与行数无关"""
+
+    def __init__(self, worksheet, archive, path):
+        self.worksheet = worksheet
+        self.title = worksheet.title
+        self._archive = archive
+        self._path = path
+        self._merged_ranges = None
+        # 合并单元格已读取时，与完整模式一致：合并区域中除左上角以外的单元格值为空
+        self._merged_by_row = {}
+        self._last_row = 0
+        self._rows = None
+        self._rows_limit = 0
+
+        # 工作表自带的尺寸信息可能不准确，按实际内容读取
+        self.worksheet.reset_dimensions()
+
+    @property
+    def merged_ranges(self):
+        """合并单元格，首次使用时才扫描工作表XML（账单总览需要；遍历账单明细不需要）"""
+        if self._merged_ranges is None:
+            self._merged_ranges = frozenset(read_merged_ranges(self._archive, self._path))
+            self._merged_by_row = _merged_by_row(self._merged_ranges)
+        return self._merged_ranges
+
+    @property
+    def max_row(self):
+        """与openpyxl完整模式的max_row一致（遍历完成后有效）"""
+        return max(self._last_row, max((r[3] for r in self.merged_ranges), default=0), 1)
+
+    def _blank_merged(self, row, values):
+        values = list(values)
+        for first_col, last_col in self._merged_by_row[row]:
+            for col in range(first_col, min(last_col, len(values)) + 1):
+                values[col - 1] = None
+        return tuple(values)
+
+    def iter_rows(self):
+        """逐行返回单元格值；没有任何单元格的行在其后出现内容时才补齐为空行"""
+        pending = 0
+        row = 0
+        for values in self.worksheet.iter_rows(values_only=True):
+            row += 1
+            if not values:
+                pending += 1
+                continue
+            for _ in range(pending):
+                yield ()
+            pending = 0
+            if row in self._merged_by_row:
+                values = self._blank_merged(row, values)
+            self._last_row = row
+            yield values
+
+    def value(self, row, column):
+        """读取少量单元格（用于账单总览），前若干行只解析一次并缓存"""
+        if self._rows is None or (row > len(self._rows) and len(self._rows) == self._rows_limit):
+            # 先读取合并单元格，缓存的行与完整模式一致
+            self.merged_ranges
+            self._rows_limit = max(row, OVERVIEW_ROWS)
+            self._rows = []
+            rows = self.iter_rows()
+            for values in rows:
+                self._rows.append(values)
+                if len(self._rows) >= self._rows_limit:
+                    break
+            rows.close()
+        if row <= len(self._rows):
+            values = self._rows[row - 1]
+            if column <= len(values):
+                return values[column - 1]
+        return None
+
+
+class OpenpyxlWorkbook:
+    """openpyxl工作簿，streaming=True时使用只读模式逐行读取"""
+
+    def __init__(self, source, streaming=False):
+        import openpyxl
+
+        self.streaming = streaming
+        self.workbook = openpyxl.load_workbook(source, read_only=streaming, data_only=True)
+        self.sheetnames = self.workbook.sheetnames
+        self._archive = None
+        self._sheet_paths = None
+        if streaming:
+            self._archive = zipfile.ZipFile(source)
+            self._sheet_paths = dict(read_sheet_paths(self._archive))
+
+    def sheet(self, name):
+        worksheet = self.workbook[name]
+        if not self.streaming:
+            return OpenpyxlSheet(worksheet)
+        return StreamingSheet(worksheet, self._archive, self._sheet_paths[name])
+
+    def close(self):
+        if self.streaming:
+            self.workbook.close()
+            self._archive.close()
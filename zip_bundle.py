@@ -0,0 +1,44 @@
+import posixpath
+from functools import partial
+
+
+# 压缩包中作为账单处理的文件扩展名
+BILL_EXTENSIONS = (".xlsx", ".xls")
+
+# 文件名使用UTF-8编码的标志位
+_UTF8_FLAG = 0x800
+
+
+def is_zip_name(name):
+    return name.lower().endswith(".zip")
+
+
+def member_name(info):
+    """压缩包内的文件名：未标记UTF-8的文件名按GBK解码（中文Windows系统创建的压缩包）"""
+    if info.flag_bits & _UTF8_FLAG:
+        return info.filename
+    try:
+        return info.filename.encode("cp437").decode("gbk")
+    except (UnicodeEncodeError, UnicodeDecodeError):
+        return info.filename
+
+
+def bill_members(archive):
+    """压缩包中的账单文件 [(文件名, ZipInfo), ...]（按压缩包中的顺序），
+    跳过目录、macOS附带的资源文件和Excel的临时文件"""
+    members = []
+    for info in archive.infolist():
+        if info.is_dir():
+            continue
+        name = member_name(info)
+        base_name = posixpath.basename(name)
+        if name.startswith("__MACOSX/") or base_name.startswith(("~$", "._")):
+            continue
+        if base_name.lower().endswith(BILL_EXTENSIONS):
+            members.append((name, info))
+    return members
+
+
+def member_reader(archive, info):
+    """读取一个文件的函数：作为任务的文件内容时，到开始处理该文件时才解压（参见batch_runner._load）"""
+    return partial(archive.read, info)
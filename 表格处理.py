@@ -1,473 +1,237 @@
-import streamlit as st
-import pandas as pd
-import openpyxl
-import os
-import traceback
-import re
 import io
-import tempfile
-import base64
-
-
-class ExcelProcessor:
-    def __init__(self):
-        self.monthly_account = None
-        self.billing_period = None
-        self.order_count = None
-        self.file_path = None
-        self.total_fee = None
-        self.total_discount = None
-        self.total_payable = None
-        self.total_claims = None
-        self.overview_amount = None  # 新增：账单总览金额
-        self.special_ticket_discount = None  # 新增：特殊单票折扣
-
-    def process_excel(self, file_bytes, file_name):
-        """处理Excel文件，提取所需信息"""
-        self.file_path = file_name  # 使用文件名代替完整路径
+import os
+import uuid
+import zipfile
 
-        try:
-            # 创建临时文件以使openpyxl能够处理
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as temp_file:
-                temp_file.write(file_bytes)
-                temp_path = temp_file.name
-
-            # 使用openpyxl加载工作簿以处理合并单元格
-            wb = openpyxl.load_workbook(temp_path, data_only=True)
-
-            # 1. 获取月结账号 (从账单总览sheet的D6:G6合并单元格)
-            try:
-                overview_sheet = wb["账单总览"]
-            except KeyError:
-                # 如果没有找到账单总览，尝试找其他可能的sheet名
-                sheet_names = wb.sheetnames
-                overview_sheet = None
-                for name in sheet_names:
-                    if "总览" in name or "概览" in name:
-                        overview_sheet = wb[name]
-                        break
-                
-                if overview_sheet is None:
-                    # 如果仍然找不到，使用第一个sheet
-                    overview_sheet = wb[sheet_names[0]]
-
-            # 查找合并单元格
-            for merged_range in overview_sheet.merged_cells.ranges:
-                min_col, min_row, max_col, max_row = merged_range.min_col, merged_range.min_row, merged_range.max_col, merged_range.max_row
-
-                # 检查J6:L6合并单元格 (D=4, G=7, 行号为6)
-                if min_col == 4 and max_col == 7 and min_row == 6 and max_row == 6:
-                    # 从合并单元格的左上角获取值
-                    self.monthly_account = overview_sheet.cell(row=6, column=4).value
-                    break
-
-            # 2. 获取账单周期 (从账单总览sheet的D7:G7合并单元格)
-            for merged_range in overview_sheet.merged_cells.ranges:
-                min_col, min_row, max_col, max_row = merged_range.min_col, merged_range.min_row, merged_range.max_col, merged_range.max_row
-
-                # 检查D7:G7合并单元格 (D=4, G=7, 行号为7)
-                if min_col == 4 and max_col == 7 and min_row == 7 and max_row == 7:
-                    # 从合并单元格的左上角获取值
-                    self.billing_period = overview_sheet.cell(row=7, column=4).value
-                    break
-
-            # 3. 获取当月单量 - 修改为统计N列值为"运费"的行数
-            try:
-                detail_sheet = wb["账单明细"]
-            except KeyError:
-                # 如果没有找到账单明细，尝试找其他可能的sheet名
-                sheet_names = wb.sheetnames
-                detail_sheet = None
-                for name in sheet_names:
-                    if "明细" in name or "详情" in name:
-                        detail_sheet = wb[name]
-                        break
-                
-                if detail_sheet is None:
-                    # 如果仍然找不到，使用第一个不是总览的sheet
-                    for name in sheet_names:
-                        if name != overview_sheet.title:
-                            detail_sheet = wb[name]
-                            break
-
-            # 查找标题行
-            header_row = None
-            for row in range(1, 10):  # 在前10行中查找标题
-                found_header = False
-                for col in range(1, 15):  # 在前15列中查找
-                    cell_value = detail_sheet.cell(row=row, column=col).value
-                    if cell_value and isinstance(cell_value, str) and "服务" in cell_value:
-                        header_row = row
-                        found_header = True
-                        break
-                if found_header:
-                    break
-            
-            # 统计N列中值为"运费"的行数（N列=14）
-            n_column = 14
-            freight_count = 0
-            
-            if header_row:
-                for row in range(header_row + 1, detail_sheet.max_row + 1):
-                    n_value = detail_sheet.cell(row=row, column=n_column).value
-                    if n_value and isinstance(n_value, str) and n_value.strip() == "运费":
-                        freight_count += 1
-            
-            if freight_count > 0:
-                self.order_count = freight_count
-            else:
-                # 如果在N列中没有找到"运费"，回退到备选方法
-                # 检查是否有其他列中包含"运费"
-                freight_col = None
-                if header_row:
-                    for col in range(1, detail_sheet.max_column + 1):
-                        for row in range(header_row + 1, min(header_row + 10, detail_sheet.max_row + 1)):
-                            cell_value = detail_sheet.cell(row=row, column=col).value
-                            if cell_value and isinstance(cell_value, str) and cell_value.strip() == "运费":
-                                freight_col = col
-                                break
-                        if freight_col:
-                            break
-                
-                if freight_col:
-                    # 如果找到了包含"运费"的列，统计该列中的"运费"行数
-                    freight_count = 0
-                    for row in range(header_row + 1, detail_sheet.max_row + 1):
-                        cell_value = detail_sheet.cell(row=row, column=freight_col).value
-                        if cell_value and isinstance(cell_value, str) and cell_value.strip() == "运费":
-                            freight_count += 1
-                    self.order_count = freight_count
-                else:
-                    # 如果仍然没找到，回退到原来的方法
-                    numeric_values = []
-                    for row in range(2, detail_sheet.max_row + 1):
-                        cell_value = detail_sheet.cell(row=row, column=1).value
-                        if cell_value is not None:
-                            try:
-                                if isinstance(cell_value, str):
-                                    numbers = re.findall(r'\d+', cell_value)
-                                    if numbers:
-                                        numeric_values.append(int(numbers[0]))
-                                elif isinstance(cell_value, (int, float)):
-                                    numeric_values.append(int(cell_value))
-                            except (ValueError, TypeError):
-                                continue
-
-                    if numeric_values:
-                        self.order_count = max(numeric_values)
-                    else:
-                        non_empty_rows = 0
-                        for row in range(2, detail_sheet.max_row + 1):
-                            if detail_sheet.cell(row=row, column=1).value is not None:
-                                non_empty_rows += 1
-                        self.order_count = non_empty_rows
-
-            # 4. 获取账单明细中的汇总数据
-            # 动态查找汇总数据所在行
-            self._find_summary_values(detail_sheet)
-            
-            # 5. 获取账单总览金额 (从账单总览sheet的J17:L17合并单元格)
-            self._find_overview_amount(overview_sheet)
-            
-            # 6. 获取特殊单票折扣
-            self._find_special_ticket_discount(detail_sheet)
-
-            # 删除临时文件
-            try:
-                os.unlink(temp_path)
-            except:
-                pass
-
-            return {
-                "月结账号": self.monthly_account,
-                "账单周期": self.billing_period,
-                "当月单量": self.order_count,
-                "费用(元)": self.total_fee,
-                "折扣/促销": self.total_discount,
-                "应付金额": self.total_payable,
-                "理赔费用合计": self.total_claims,
-                "账单总览金额": self.overview_amount,  # 新增字段
-                "特殊单票折扣": self.special_ticket_discount,  # 新增字段
-                "文件名": file_name
-            }
-
-        except Exception as e:
-            # 确保清理临时文件
-            try:
-                if 'temp_path' in locals():
-                    os.unlink(temp_path)
-            except:
-                pass
-            error_message = f"处理文件时出错: {str(e)}\n{traceback.format_exc()}"
-            raise Exception(error_message)
-
-    def _find_overview_amount(self, overview_sheet):
-        """获取账单总览金额（从账单总览sheet的J17:L17合并单元格）"""
-        self.overview_amount = None
-        
-        try:
-            # 首先检查J16:L16是否为合并单元格
-            for merged_range in overview_sheet.merged_cells.ranges:
-                min_col, min_row, max_col, max_row = merged_range.min_col, merged_range.min_row, merged_range.max_col, merged_range.max_row
-                
-                # 检查J16:L16合并单元格 (J=10, L=12, 行号为17)
-                if min_col == 10 and max_col == 12 and min_row == 17 and max_row == 17:
-                    # 从合并单元格的左上角获取值
-                    self.overview_amount = overview_sheet.cell(row=17, column=10).value
-                    return
-            
-            # 如果没有找到合并单元格，尝试直接获取J17单元格的值
-            self.overview_amount = overview_sheet.cell(row=17, column=10).value
-            
-            # 如果还是没有找到值，尝试在总览页面寻找"合计"或"总计"附近的金额
-            if not self._is_valid_number(self.overview_amount):
-                for row in range(15, 25):  # 在15-25行范围内查找
-                    for col in range(1, 15):
-                        cell_value = overview_sheet.cell(row=row, column=col).value
-                        if cell_value and isinstance(cell_value, str) and ("合计" in cell_value or "总计" in cell_value):
-                            # 找到合计行，尝试在同一行的后面几列查找金额
-                            for right_col in range(col + 1, col + 5):
-                                right_value = overview_sheet.cell(row=row, column=right_col).value
-                                if self._is_valid_number(right_value):
-                                    self.overview_amount = right_value
-                                    return
-        except Exception as e:
-            print(f"查找账单总览金额时出错: {str(e)}")
-            traceback.print_exc()
-
-    def _find_special_ticket_discount(self, detail_sheet):
-        """查找特殊单票折扣 - 类似理赔费用的查找逻辑"""
-        self.special_ticket_discount = None
-        max_row = detail_sheet.max_row
-        
-        try:
-            # 首先检查是否存在"特殊单票折扣"相关单元格
-            has_special_discount = False
-            for row in range(1, max_row + 1):
-                for col in range(1, 20):
-                    cell_value = detail_sheet.cell(row=row, column=col).value
-                    if cell_value and isinstance(cell_value, str) and "特殊单票折扣" in cell_value:
-                        has_special_discount = True
-                        break
-                if has_special_discount:
-                    break
-            
-            # 如果存在特殊单票折扣相关单元格，则在D列中找到最大的数字
-            if has_special_discount:
-                d_column_values = []
-                for row in range(2, max_row + 1):  # 从第2行开始，跳过表头
-                    cell_value = detail_sheet.cell(row=row, column=4).value  # D列 = 4
-                    if self._is_valid_number(cell_value):
-                        # 如果是字符串，尝试转换为浮点数
-                        if isinstance(cell_value, str):
-                            try:
-                                cleaned_value = re.sub(r'[^\d.-]', '', cell_value)
-                                if cleaned_value:  # 确保不是空字符串
-                                    d_column_values.append(float(cleaned_value))
-                            except ValueError:
-                                pass
-                        else:
-                            d_column_values.append(float(cell_value))
-                
-                # 从D列值中找到最大的数值作为特殊单票折扣
-                if d_column_values:
-                    self.special_ticket_discount = max(d_column_values)
-                else:
-                    self.special_ticket_discount = None  # 没有找到值，特殊单票折扣为空
-            else:
-                # 如果不存在特殊单票折扣相关单元格，则设置为None
-                self.special_ticket_discount = None
-                
-        except Exception as e:
-            print(f"查找特殊单票折扣时出错: {str(e)}")
-            traceback.print_exc()
-
-    def _is_valid_number(self, value):
-        """检查值是否为有效数字"""
-        if value is None:
-            return False
+import streamlit as st
 
-        try:
-            # 如果是字符串，尝试转换为浮点数
-            if isinstance(value, str):
-                # 去除可能的货币符号、括号等
-                cleaned_value = re.sub(r'[^\d.-]', '', value)
-                if cleaned_value:  # 确保不是空字符串
-                    float(cleaned_value)
-                    return True
-                return False
-            # 直接检查是否为数字类型
-            return isinstance(value, (int, float))
-        except (ValueError, TypeError):
-            return False
-
-    def _find_summary_values(self, detail_sheet):
-        """查找汇总数据 - 通过搜索文本而不依赖于固定位置"""
-        # 初始化默认值为None，表示未找到
-        self.total_fee = None
-        self.total_discount = None
-        self.total_payable = None
-        self.total_claims = None
-
-        max_row = detail_sheet.max_row
+from batch_runner import DEFAULT_TIMEOUT, default_workers
+from diagnostics import enable_stats_log, profile_file, stats_rows
+from excel_processor import RESULT_COLUMNS, ExcelProcessor
+from result_cache import cached_outcome, content_hash, store_outcome
+from result_export import EXPORT_MIME_TYPES, export_bytes
+from reader_backends import calamine_available
+from result_store import ResultStore
+from results_db import ResultsDatabase
+from results_view import PAGE_SIZES, ResultsView, filter_options, page_count, page_slice
+from rollups import ROLLUP_DIMENSIONS
+from shared_pool import DEFAULT_MEMORY_BUDGET_MB, SharedExtractionPool
+from zip_bundle import bill_members, is_zip_name, member_reader
+
+
+# 所有会话共用的解析进程池的设置（服务器级别，由环境变量指定）
+PARSE_WORKERS = int(os.environ.get("BILL_PARSE_WORKERS") or min(default_workers(), 8))  # 同时解析的文件数上限
+MEMORY_BUDGET_MB = int(os.environ.get("BILL_MEMORY_BUDGET_MB") or DEFAULT_MEMORY_BUDGET_MB)  # 同时解析的内存预算
+FILE_TIMEOUT = float(os.environ.get("BILL_FILE_TIMEOUT") or DEFAULT_TIMEOUT)  # 单个文件超时（秒）
+STATS_LOG = os.environ.get("BILL_STATS_LOG")  # 每个文件各处理阶段的耗时以JSON行写入该文件（不设置时不写）
+
+# 压缩包中尚未计算内容哈希的文件使用的临时键的前缀
+UNHASHED_PREFIX = "unhashed:"
+
+
+# 导出格式及显示名称
+EXPORT_LABELS = {
+    "xlsx": "Excel (.xlsx)",
+    "csv": "CSV (.csv)",
+    "parquet": "Parquet (.parquet)",
+}
+
+
+@st.cache_resource
+def stats_log(path):
+    """处理统计日志（整个应用只配置一次，页面重新运行时不重复添加）"""
+    return enable_stats_log(path)
+
+
+@st.cache_resource
+def results_database():
+    """持久保存的结果库（所有会话共用）：刷新页面后仍可加载，已解析过的文件不再重新解析"""
+    return ResultsDatabase()
+
+
+@st.cache_resource
+def shared_pool():
+    """所有会话共用的解析进程池和提取结果缓存：限制同时解析的文件数和内存占用，各会话轮流排队；
+    关闭页面后已提交的文件继续处理，重新上传时直接使用结果"""
+    return SharedExtractionPool(
+        workers=PARSE_WORKERS,
+        memory_budget_mb=MEMORY_BUDGET_MB,
+        timeout=FILE_TIMEOUT,
+        results_db=results_database(),
+        streaming=True,
+        fast=True,
+        calamine=calamine_available()
+    )
 
+
+@st.experimental_fragment(run_every=1)
+def show_job_progress(running, seen, finished, total):
+    """后台处理进度，每秒刷新；有文件完成或任务结束时重新运行整个页面，更新结果表格"""
+    if sum(job.finished for job in running) != seen or not any(job.running for job in running):
+        st.rerun()
+    st.progress(finished / total)
+    positions = [job.queue_position() for job in running]
+    ahead = [position for position, _ in positions if position is not None]
+    if ahead and not any(parsing for _, parsing in positions):
+        # 解析进程正在处理其他会话的文件
+        st.text(f"排队等待解析 {total - finished} 个文件，前面还有 {min(ahead)} 个文件，处理期间可以继续查看结果")
+    else:
+        st.text(f"正在后台处理 {total - finished} 个文件 ({finished}/{total})，处理期间可以继续查看结果")
+    if st.button("取消处理"):
+        for job in running:
+            job.cancel()
+        st.rerun()
+
+
+@st.experimental_fragment
+def show_results_table(result_store):
+    """结果表格：在服务器端筛选、排序和分页，只把当前页发送到浏览器；
+    结果变化后才重新转换为Arrow表格，翻页、筛选时只重新运行这一部分"""
+    if "results_view" not in st.session_state:
+        st.session_state.results_view = ResultsView()
+    table = result_store.arrow_table()
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        accounts = st.multiselect("按月结账号筛选", filter_options(table, "月结账号"), key="filter_accounts")
+    with col2:
+        periods = st.multiselect("按账单周期筛选", filter_options(table, "账单周期"), key="filter_periods")
+    with col3:
+        name_contains = st.text_input("文件名包含", key="filter_name").strip()
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        sort_by = st.selectbox("排序", [None] + RESULT_COLUMNS, format_func=lambda c: "按处理顺序" if c is None else c)
+    with col2:
+        descending = st.radio("排序方向", ["升序", "降序"], horizontal=True) == "降序"
+    with col3:
+        page_size = st.selectbox("每页行数", PAGE_SIZES)
+    
+    rows = st.session_state.results_view.query(
+        result_store,
+        {"月结账号": accounts, "账单周期": periods},
+        name_contains,
+        sort_by,
+        descending
+    )
+    pages = page_count(rows.num_rows, page_size)
+    query = (tuple(accounts), tuple(periods), name_contains, sort_by, descending, page_size)
+    if st.session_state.get("results_query") != query:
+        # 筛选、排序条件变化后回到第1页
+        st.session_state.results_query = query
+        st.session_state.results_page = 1
+    st.session_state.results_page = min(st.session_state.get("results_page", 1), pages)
+    with col4:
+        page = st.number_input("页码", min_value=1, max_value=pages, key="results_page")
+    
+    st.dataframe(page_slice(rows, page, page_size), hide_index=True, use_container_width=True)
+    st.caption(f"第 {page}/{pages} 页，筛选出 {rows.num_rows} 条结果（共 {table.num_rows} 条）")
+
+
+def show_export(results_df):
+    """导出结果：点击时才生成文件，结果未变化时复用已生成的文件"""
+    version = st.session_state.result_store.version
+    exports = st.session_state.get("exports")
+    if exports is None or exports["version"] != version:
+        # 结果已变化，之前生成的文件作废
+        exports = st.session_state.exports = {"version": version, "files": {}}
+    
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        fmt = st.selectbox("导出格式", list(EXPORT_LABELS), format_func=EXPORT_LABELS.get)
+    
+    data = exports["files"].get(fmt)
+    with col2:
+        if data is None and st.button("生成导出文件"):
+            with st.spinner("正在生成导出文件..."):
+                data = exports["files"][fmt] = export_bytes(results_df, fmt)
+        if data is not None:
+            st.download_button(
+                f"下载{EXPORT_LABELS[fmt]}文件",
+                data,
+                file_name=f"账单数据提取结果.{fmt}",
+                mime=EXPORT_MIME_TYPES[fmt]
+            )
+
+
+def show_rollups(rollups):
+    """按月结账号、按账单周期汇总（汇总随结果增量更新）"""
+    st.markdown("## 汇总")
+    for tab, dimension in zip(st.tabs([f"按{d}" for d in ROLLUP_DIMENSIONS]), ROLLUP_DIMENSIONS):
+        with tab:
+            st.dataframe(rollups.frame(dimension), hide_index=True, use_container_width=True)
+
+
+def upload_entries(uploaded_files, file_hashes):
+    """展开上传的文件，返回 ([(文件名, 内容哈希, 读取文件内容的函数, 文件大小), ...], 各上传文件的哈希)
+
+    ZIP压缩包中的每个账单作为一个文件，文件名为"压缩包名/包内路径"，不解压到磁盘；首次上传时不预先解压计算哈希，
+    使用临时键（UNHASHED_PREFIX开头），开始处理时才解压一次并计算内容哈希（参见SharedExtractionPool.submit）
+    """
+    entries = []
+    current_hashes = {}
+    for file in uploaded_files:
+        if not is_zip_name(file.name):
+            key = file_hashes.get(file.file_id)
+            if key is None:
+                key = content_hash(file.getvalue())
+            current_hashes[file.file_id] = key
+            entries.append((file.name, key, file.getvalue, file.size))
+            continue
         try:
-            # 从表格的最后30行开始向上查找汇总数据
-            search_start = max(2, max_row - 50)
-
-            # 先查找包含"合计"或者"总计"的行
-            total_rows = []
-            for row in range(max_row, search_start, -1):
-                found_total = False
-                for col in range(1, 20):  # 扫描更多列以确保能找到关键词
-                    cell_value = detail_sheet.cell(row=row, column=col).value
-                    if cell_value and isinstance(cell_value, str) and (
-                            "合计" in cell_value or "合 计" in cell_value or "总计" in cell_value):
-                        total_rows.append(row)
-                        found_total = True
-                        break
-                if found_total:
-                    continue  # 继续搜索其他可能的汇总行
-
-            if total_rows:
-                # 找到了可能的汇总行，开始在这些行周围寻找关键字段
-                for row in total_rows:
-                    # 查找标题行 - 通常在数据的前几行
-                    header_row = None
-                    fee_col = None  # 初始化fee_col变量
-                    discount_col = None
-                    payable_col = None
-
-                    for r in range(1, 30):  # 查找更多行以找到标题
-                        for c in range(1, 20):
-                            header_value = detail_sheet.cell(row=r, column=c).value
-                            if header_value and isinstance(header_value, str):
-                                # 查找与费用(元)、折扣/促销、应付金额相关的标题
-                                if "费用" in header_value and ("元" in header_value or "¥" in header_value):
-                                    fee_col = c
-                                    header_row = r
-                                if "折扣" in header_value or "促销" in header_value:
-                                    discount_col = c
-                                if "应付" in header_value and "金额" in header_value:
-                                    payable_col = c
-
-                    # 如果找到了标题行和至少一个相关列，根据标题位置查找对应的汇总值
-                    if header_row and (fee_col or discount_col or payable_col):
-                        if fee_col:
-                            fee_value = detail_sheet.cell(row=row, column=fee_col).value
-                            if self._is_valid_number(fee_value) and self.total_fee is None:
-                                self.total_fee = fee_value
-                        if discount_col:
-                            discount_value = detail_sheet.cell(row=row, column=discount_col).value
-                            if self._is_valid_number(discount_value) and self.total_discount is None:
-                                self.total_discount = discount_value
-                        if payable_col:
-                            payable_value = detail_sheet.cell(row=row, column=payable_col).value
-                            if self._is_valid_number(payable_value) and self.total_payable is None:
-                                self.total_payable = payable_value
-                    else:
-                        # 如果没有找到标题行，则尝试在合计行查找
-                        # 寻找合计行的前一行，检查是否有标题文本
-                        prev_row = row - 1
-                        if prev_row > 0:
-                            for c in range(1, 20):
-                                col_header = detail_sheet.cell(row=prev_row, column=c).value
-                                if col_header and isinstance(col_header, str):
-                                    if "费用" in col_header and ("元" in col_header or "¥" in col_header):
-                                        fee_col = c
-                                    if "折扣" in col_header or "促销" in col_header:
-                                        discount_col = c
-                                    if "应付" in col_header and "金额" in col_header:
-                                        payable_col = c
-
-                            # 根据找到的列获取对应的汇总值
-                            if fee_col:
-                                fee_value = detail_sheet.cell(row=row, column=fee_col).value
-                                if self._is_valid_number(fee_value) and self.total_fee is None:
-                                    self.total_fee = fee_value
-                            if discount_col:
-                                discount_value = detail_sheet.cell(row=row, column=discount_col).value
-                                if self._is_valid_number(discount_value) and self.total_discount is None:
-                                    self.total_discount = discount_value
-                            if payable_col:
-                                payable_value = detail_sheet.cell(row=row, column=payable_col).value
-                                if self._is_valid_number(payable_value) and self.total_payable is None:
-                                    self.total_payable = payable_value
-
-                        # 如果仍然没有找到主要字段，则尝试从合计行向右查找数值
-                        if not all([self.total_fee, self.total_payable]):
-                            for right_col in range(1, 20):
-                                right_value = detail_sheet.cell(row=row, column=right_col).value
-                                if self._is_valid_number(right_value):
-                                    # 找到了数值，根据位置依次分配
-                                    if self.total_fee is None:
-                                        self.total_fee = right_value
-                                        continue
-                                    if self.total_discount is None:
-                                        self.total_discount = right_value
-                                        continue
-                                    if self.total_payable is None:
-                                        self.total_payable = right_value
-                                        break
-
-            # 查找理赔费用合计 - 首先检查是否存在理赔费用相关单元格
-            has_claims = False
-            for row in range(1, max_row + 1):
-                for col in range(1, 20):
-                    cell_value = detail_sheet.cell(row=row, column=col).value
-                    if cell_value and isinstance(cell_value, str) and "理赔" in cell_value:
-                        has_claims = True
-                        break
-                if has_claims:
-                    break
-            
-            # 如果存在理赔费用相关单元格，则在H列中查找最小的负值
-            if has_claims:
-                h_column_values = []
-                for row in range(2, max_row + 1):  # 从第2行开始，跳过表头
-                    cell_value = detail_sheet.cell(row=row, column=8).value  # H列 = 8
-                    if self._is_valid_number(cell_value):
-                        # 如果是字符串，尝试转换为浮点数
-                        if isinstance(cell_value, str):
-                            try:
-                                cleaned_value = re.sub(r'[^\d.-]', '', cell_value)
-                                if cleaned_value:  # 确保不是空字符串
-                                    h_column_values.append(float(cleaned_value))
-                            except ValueError:
-                                pass
-                        else:
-                            h_column_values.append(float(cell_value))
-
-                # 从H列值中找到最小的负值作为理赔费用
-                negative_values = [val for val in h_column_values if val < 0]
-                if negative_values:
-                    self.total_claims = min(negative_values)  # 取最小的负值
-                else:
-                    self.total_claims = None  # 没有找到负值，理赔费用为空
-            else:
-                # 如果不存在理赔费用相关单元格，则设置为None
-                self.total_claims = None
-
-        except Exception as e:
-            # 记录错误但不中断程序
-            print(f"查找汇总数据时出错: {str(e)}")
-            traceback.print_exc()
-
-
-def get_table_download_link(df):
-    """生成一个下载链接，允许下载DataFrame作为Excel文件"""
-    # 将DataFrame转换为Excel
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False)
-    excel_data = output.getvalue()
+            # 每次运行使用独立的文件对象（与上传文件共用同一块内存），后台任务读取时互不影响
+            archive = zipfile.ZipFile(io.BytesIO(file.getvalue()))
+        except zipfile.BadZipFile:
+            st.error(f"{file.name} 不是有效的ZIP压缩包")
+            continue
+        members = bill_members(archive)
+        keys = file_hashes.get(file.file_id)
+        if keys is None:
+            keys = [f"{UNHASHED_PREFIX}{file.file_id}/{index}" for index in range(len(members))]
+        current_hashes[file.file_id] = keys
+        for (name, info), key in zip(members, keys):
+            entries.append((f"{file.name}/{name}", key, member_reader(archive, info), info.file_size))
+    return entries, current_hashes
+
+
+def show_diagnostics_panel(entries):
+    """诊断面板：各处理阶段耗时，以及单个文件的性能分析"""
+    import pandas as pd
+
+    st.markdown("## 处理诊断")
     
-    # 使用base64编码
-    b64 = base64.b64encode(excel_data).decode()
+    stats_list = st.session_state.get("stats", [])
+    if stats_list:
+        summary_df = pd.DataFrame([
+            {"文件名": s["file"], "读取方式": s["reader"], "总耗时(秒)": s["seconds"], "错误": s.get("error")}
+            for s in stats_list
+        ])
+        st.dataframe(summary_df, hide_index=True, use_container_width=True)
+        with st.expander("各阶段耗时"):
+            st.dataframe(pd.DataFrame(stats_rows(stats_list)), hide_index=True, use_container_width=True)
+    else:
+        st.info("暂无诊断信息（使用缓存结果的文件不会重新处理）")
     
-    # 创建下载链接
-    href = f'<a href="data:application/vnd.openxmlformats-officedocument.spreadsheetml.sheet;base64,{b64}" download="账单数据提取结果.xlsx">下载Excel文件</a>'
-    return href
+    if not entries:
+        return
+    
+    # 对单个文件做性能分析（在当前进程中重新处理一次）
+    with st.expander("单个文件性能分析"):
+        names = [name for name, _, _, _ in entries]
+        selected = st.selectbox("选择文件", names)
+        kind = st.radio("分析类型", ["cpu", "memory"], format_func=lambda k: "CPU耗时 (cProfile)" if k == "cpu" else "内存分配 (tracemalloc)", horizontal=True)
+        if st.button("开始分析"):
+            _, _, read, _ = entries[names.index(selected)]
+            file_name = selected.rsplit("/", 1)[-1]
+            processor = ExcelProcessor(streaming=True, fast=True, calamine=calamine_available())
+            with st.spinner("正在分析..."):
+                report, raw = profile_file(processor, read(), selected, kind=kind)
+            st.code(report)
+            st.download_button(
+                "下载分析数据",
+                raw,
+                file_name=f"{file_name}.prof" if kind == "cpu" else f"{file_name}_memory.txt"
+            )
 
 
 def main():
@@ -476,6 +240,8 @@ def main():
         page_icon="📊",
         layout="wide"
     )
+    if STATS_LOG:
+        stats_log(STATS_LOG)
 
     st.markdown("# 供销云仓账单数据提取工具")
     st.markdown("---")
@@ -485,102 +251,211 @@ def main():
         st.header("操作面板")
         
         uploaded_files = st.file_uploader(
-            "上传账单Excel文件",
-            type=["xlsx", "xls"],
-            accept_multiple_files=True
+            "上传账单Excel文件或ZIP压缩包",
+            type=["xlsx", "xls", "zip"],
+            accept_multiple_files=True,
+            help="也可以上传包含多个账单的ZIP压缩包，包中的账单逐个解压处理"
+        )
+        
+        # 解析进程池所有会话共用，同时解析的文件数和内存预算由服务器统一设置
+        pool = shared_pool()
+        status = pool.status()
+        st.caption(
+            f"解析进程 {status['workers']} 个：正在解析 {status['running']} 个文件，"
+            f"{status['sessions']} 个会话共 {status['queued']} 个文件排队"
+            f"（内存预算 {status['memory_mb']}/{status['memory_budget_mb']} MB）"
         )
         
+        show_diagnostics = st.checkbox(
+            "显示处理诊断信息",
+            value=False,
+            help="显示每个文件各处理阶段的耗时，并可对单个文件做性能分析"
+        )
+        
+        db = results_database()
+        load_history = None
+        with st.expander("历史账单"):
+            accounts = st.multiselect("月结账号", db.accounts(), help="不选时加载全部月结账号")
+            periods = st.multiselect("账单周期", db.periods(), help="不选时加载全部账单周期")
+            if st.button("加载历史账单"):
+                load_history = (accounts, periods)
+        
         if st.button("清除结果", key="clear_button"):
             # 清除结果
-            if "results" in st.session_state:
-                st.session_state.results = []
+            if "result_store" in st.session_state:
+                st.session_state.result_store.clear()
                 st.success("已清除所有结果！")
     
     # 主界面 - 显示结果表格
-    if "results" not in st.session_state:
-        st.session_state.results = []
+    if "result_store" not in st.session_state:
+        # 按文件名索引的结果，记录内容哈希以识别同名但内容已变化的文件
+        st.session_state.result_store = ResultStore()
+    result_store = st.session_state.result_store
+    if "session_id" not in st.session_state:
+        # 共用进程池中按会话排队
+        st.session_state.session_id = uuid.uuid4().hex
+        st.session_state.file_hashes = {}
+    if "batches" not in st.session_state:
+        # 本会话提交的批次
+        st.session_state.batches = []
+    if "retry_outcomes" not in st.session_state:
+        # 暂时失败（超时等）的文件不缓存，本会话中保留到点击"重新处理失败的文件"，不在每次重新运行时自动重新处理
+        st.session_state.retry_outcomes = {}
+    
+    if load_history is not None:
+        # 从结果库加载之前处理过的账单，无需重新上传和解析
+        history = db.load(*load_history)
+        for key, result in history:
+            result_store.add(result, key)
+        st.success(f"已加载 {len(history)} 个历史账单")
     
     # 处理上传的文件
+    entries = []
     if uploaded_files:
-        processor = ExcelProcessor()
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-        
-        total_files = len(uploaded_files)
-        processed_count = 0
         failed_files = []
+        # 按内容哈希缓存提取结果（所有会话共用），相同文件无需重新解析
+        cache = pool.cache
+        # 只保留当前上传文件的哈希
+        entries, st.session_state.file_hashes = upload_entries(uploaded_files, st.session_state.file_hashes)
         
-        for i, file in enumerate(uploaded_files):
-            try:
-                # 更新进度
-                progress = (i + 1) / total_files
-                progress_bar.progress(progress)
-                
-                # 更新状态栏
-                status_text.text(f"正在处理: {file.name} ({i + 1}/{total_files})")
-                
-                # 处理Excel文件
-                file_bytes = file.read()
-                result = processor.process_excel(file_bytes, file.name)
-                
-                # 检查结果是否已存在（按文件名）
-                exists = False
-                for r in st.session_state.results:
-                    if r["文件名"] == result["文件名"]:
-                        exists = True
-                        break
-                
-                # 只有不存在时才添加
-                if not exists:
-                    st.session_state.results.append(result)
-                
-                processed_count += 1
-                
-            except Exception as e:
-                failed_files.append((file.name, str(e)))
-                st.error(f"处理文件 {file.name} 失败")
-                print(f"处理文件 {file.name} 失败: {str(e)}")
+        # 先查缓存：相同内容的文件直接使用缓存结果
+        keys = [key for _, key, _, _ in entries]
+        # 只保留当前上传文件中暂时失败的文件
+        retry_outcomes = st.session_state.retry_outcomes = {
+            key: outcome for key, outcome in st.session_state.retry_outcomes.items() if key in keys
+        }
+        outcomes = []
+        pending = []
+        for i, (name, key, _, _) in enumerate(entries):
+            outcome = cached_outcome(cache, key, name) or retry_outcomes.get(key)
+            outcomes.append(outcome)
+            if outcome is None:
+                pending.append(i)
         
-        # 完成处理后的操作
-        progress_bar.empty()
+        # 再查结果库：之前的会话中处理过的文件无需解析
+        stored = db.get_many([keys[i] for i in pending if not keys[i].startswith(UNHASHED_PREFIX)]) if pending else {}
+        for i in pending:
+            result = stored.get(keys[i])
+            if result is not None:
+                store_outcome(cache, keys[i], ("ok", result))
+                outcomes[i] = cached_outcome(cache, keys[i], entries[i][0])
+        pending = [i for i in pending if outcomes[i] is None]
         
-        if failed_files:
-            status_text.text(f"已完成处理 {processed_count} 个文件，{len(failed_files)} 个文件失败")
+        # 其余文件交给共用的进程池在后台处理，页面不必等待；重新运行时接回本会话已提交的批次
+        jobs = st.session_state.batches
+        new_files = [i for i in pending if not any(keys[i] in job.keys for job in jobs)]
+        if new_files:
+            # 其他会话正在处理的相同文件只等待其结果，不重复解析
+            jobs.append(pool.submit(
+                st.session_state.session_id,
+                # 文件内容在开始处理该文件时才读取（压缩包中的文件此时才解压）
+                [(entries[i][0], entries[i][2]) for i in new_files],
+                [keys[i] for i in new_files],
+                sizes=[entries[i][3] for i in new_files],
+                unhashed=[keys[i] for i in new_files if keys[i].startswith(UNHASHED_PREFIX)]
+            ))
+        
+        # 已完成的文件存入缓存；其余文件正在处理，或因取消而未处理
+        waiting = []
+        unfinished = []
+        resolved = {}
+        for i in pending:
+            owner = next(job for job in jobs if keys[i] in job.keys)
+            outcome = owner.outcomes.get(keys[i])
+            if outcome is not None:
+                # 临时键的文件处理时已计算内容哈希，此后改用内容哈希
+                content_key = owner.content_keys.get(keys[i])
+                if content_key is not None:
+                    resolved[keys[i]] = content_key
+                    keys[i] = content_key
+                if store_outcome(cache, keys[i], outcome):
+                    outcomes[i] = cached_outcome(cache, keys[i], entries[i][0])
+                else:
+                    retry_outcomes[keys[i]] = outcomes[i] = outcome
+            elif owner.running:
+                waiting.append(i)
+            else:
+                unfinished.append(i)
+        if resolved:
+            # 重新运行时直接按内容哈希使用缓存结果
+            file_hashes = st.session_state.file_hashes
+            for file_id, file_keys in file_hashes.items():
+                if isinstance(file_keys, list):
+                    file_hashes[file_id] = [resolved.get(key, key) for key in file_keys]
+        
+        # 只保留还有未取走结果的批次
+        st.session_state.batches = [
+            job for job in jobs if job.running or any(key not in job.outcomes for key in job.keys)
+        ]
+        if jobs:
+            # 只保留实际处理的文件的统计（缓存命中的文件没有统计）
+            st.session_state.stats = [stats for job in jobs for stats in job.stats]
+        
+        # 按上传顺序汇总结果，与完成先后无关
+        for (name, _, _, _), key, outcome in zip(entries, keys, outcomes):
+            if outcome is None:
+                continue
+            status, payload = outcome
+            if status != "ok":
+                failed_files.append((name, payload))
+                st.error(f"处理文件 {name} 失败")
+                print(f"处理文件 {name} 失败: {payload}")
+                continue
             
+            # 按文件名去重：已存在且内容未变化时保持不变，内容已变化时替换
+            result_store.add(payload, key)
+        
+        processed_count = len(entries) - len(waiting) - len(unfinished) - len(failed_files)
+        if waiting:
+            running = [job for job in jobs if job.running]
+            show_job_progress(running, sum(job.finished for job in running), len(entries) - len(waiting),
+                              len(entries))
+        elif unfinished:
+            st.warning(f"已完成处理 {processed_count} 个文件，{len(unfinished)} 个文件因取消未处理")
+            if st.button("重新处理未完成的文件"):
+                # 移除已取消的批次，重新运行时再次提交
+                st.session_state.batches = [job for job in st.session_state.batches if job.running]
+                st.rerun()
+        elif failed_files:
+            st.text(f"已完成处理 {processed_count} 个文件，{len(failed_files)} 个文件失败")
+            if retry_outcomes and st.button("重新处理失败的文件", help="重新处理超时或解析进程异常退出的文件"):
+                # 暂时失败的文件重新提交（无法处理的文件已缓存，不重新处理）
+                st.session_state.retry_outcomes = {}
+                st.rerun()
+        else:
+            st.text(f"已完成处理 {processed_count} 个文件")
+        
+        if failed_files:
             with st.expander("查看失败文件详情"):
                 for i, (file_name, error) in enumerate(failed_files):
                     st.write(f"{i + 1}. {file_name}")
                     st.write(f"错误: {error.split('Traceback')[0]}")  # 只显示错误的第一部分
-        else:
-            status_text.text(f"已完成处理 {processed_count} 个文件")
     
     # 显示结果表格
-    if st.session_state.results:
+    if len(result_store):
         st.markdown("## 处理结果")
         
-        # 转换为DataFrame
-        results_df = pd.DataFrame(st.session_state.results)
+        # 显示表格（分页）
+        show_results_table(result_store)
         
-        # 显示表格
-        st.dataframe(
-            results_df,
-            hide_index=True,
-            use_container_width=True
-        )
+        # 下载按钮；结果表格增量维护，结果未变化时不重新构建
+        show_export(result_store.frame())
         
-        # 下载按钮
-        st.markdown(get_table_download_link(results_df), unsafe_allow_html=True)
+        show_rollups(result_store.rollups)
     else:
         st.info("请上传账单Excel文件以开始处理")
     
+    if show_diagnostics:
+        show_diagnostics_panel(entries)
+    
     # 显示使用说明
     with st.expander("查看使用说明"):
         st.markdown("""
         ### 使用说明
         
-        1. 在左侧操作面板点击"上传账单Excel文件"按钮上传一个或多个账单文件。
+        1. 在左侧操作面板点击"上传账单Excel文件或ZIP压缩包"按钮上传一个或多个账单文件（或包含账单的ZIP压缩包）。
         2. 系统会自动处理上传的文件并提取关键数据。
-        3. 处理结果将显示在表格中，包含以下字段：
+        3. 处理结果将分页显示在表格中（可按月结账号、账单周期和文件名筛选，并按任意列排序），包含以下字段：
            - 文件名
            - 月结账号
            - 账单周期
@@ -591,12 +466,13 @@ def main():
            - 理赔费用合计
            - 账单总览金额
            - 特殊单票折扣
-        4. 点击"下载Excel文件"链接可以将结果下载为Excel文件。
-        5. 使用"清除结果"按钮可以清空当前结果。
+        4. 结果表格下方按月结账号、按账单周期汇总当月单量、费用、应付金额和理赔费用合计。
+        5. 选择导出格式（Excel、CSV或Parquet），点击"生成导出文件"后下载。
+        6. 使用"清除结果"按钮可以清空当前结果。
         
         ### 注意事项
         
-        - 支持的文件格式：.xlsx, .xls
+        - 支持的文件格式：.xlsx, .xls，以及包含这些文件的.zip压缩包
         - 如果某些字段没有被正确提取，可能是因为文件结构与预期不符
         - 所有处理都在浏览器中完成，数据不会被上传到服务器
         """)